@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Compare dee.parser.DesktopFile with pyxdg's DesktopEntry on parse time and
+memory per entry.
+
+    python benchmarks/bench_parser.py [--count N] [--locales N] [--repeat N]
+
+The parse time is the fastest of --repeat passes over all files. Both parsers
+are warmed up first and take turns going first, so that neither pays for a
+cold page cache or gains from the other having run.
+"""
+import os
+import sys
+import gc
+import timeit
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from xdg.DesktopEntry import DesktopEntry
+from dee.parser import DesktopFile
+
+LOCALES = ("de", "fr", "es", "it", "ja", "pt_BR", "ru", "zh_CN", "nl", "pl",
+           "sv", "cs", "fi", "ko", "tr", "da", "hu", "nb", "uk", "el")
+
+def write_entries(path, count, locales):
+    filenames = []
+    for i in range(count):
+        lines = ["# generated by bench_parser.py", "[Desktop Entry]",
+                 "Type=Application", "Name=Application %d" % i]
+        lines.extend("Name[%s]=Application %d (%s)" % (l, i, l)
+                     for l in LOCALES[:locales])
+        lines.extend(["GenericName=Benchmark Tool", "Comment=Entry number %d" % i,
+                      "Exec=app-%d %%U" % i, "Icon=utilities-terminal",
+                      "Categories=Utility;Development;", "Keywords=bench;test;",
+                      "Terminal=false", ""])
+        filename = os.path.join(path, "app-%d.desktop" % i)
+        with open(filename, 'w') as f:
+            f.write("\n".join(lines))
+        filenames.append(filename)
+    return filenames
+
+PARSERS = (("pyxdg DesktopEntry", DesktopEntry),
+           ("dee DesktopFile", DesktopFile))
+
+def parse_all(parser_class, filenames):
+    for filename in filenames:
+        parser_class(filename)
+
+def bench_time(filenames, repeat):
+    """
+    Return the fastest time of repeat passes over filenames for each parser.
+    """
+    for name, parser_class in PARSERS:
+        parse_all(parser_class, filenames)
+    times = dict((name, []) for name, parser_class in PARSERS)
+    for i in range(repeat):
+        # alternate which parser goes first
+        order = PARSERS if i % 2 == 0 else PARSERS[::-1]
+        for name, parser_class in order:
+            times[name].extend(timeit.repeat(
+                lambda: parse_all(parser_class, filenames),
+                repeat=1, number=1))
+    return dict((name, min(elapsed)) for name, elapsed in times.items())
+
+def bench_memory(parser_class, filenames):
+    gc.collect()
+    tracemalloc.start()
+    entries = [parser_class(filename) for filename in filenames]
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del entries
+    return memory
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--locales", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp(prefix="dee-bench-")
+    try:
+        filenames = write_entries(path, args.count, args.locales)
+        print("%d entries, %d locales each" % (args.count, args.locales))
+        times = bench_time(filenames, args.repeat)
+        for name, parser_class in PARSERS:
+            memory = bench_memory(parser_class, filenames)
+            print("%-20s %8.1f us/entry %8d bytes/entry" % (name,
+                    times[name] / args.count * 1000000, memory // args.count))
+        print("DesktopFile parses %.2fx as fast as pyxdg (best of %d)"
+              % (times["pyxdg DesktopEntry"] / times["dee DesktopFile"],
+                 args.repeat))
+    finally:
+        shutil.rmtree(path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+"""
+Time the stages of loading the launcher list on a synthetic XDG tree.
+
+    python benchmarks/run.py [--count N] [--output FILE] [--compare FILE]
+    python benchmarks/run.py --xvfb ...
+
+The stages _load_treeview is built from (finding the files, parsing them,
+checking whether they are read-only, rendering their icons and appending
+the rows to the model) are timed separately and written as JSON. The GTK+
+stages are only run when a display is available; --xvfb re-runs the suite
+under xvfb-run to get one. With --compare the results are checked against
+an earlier JSON file and the exit status is 1 if any stage got slower than
+the allowed threshold, or if the memory used per launcher by the list is
+over ROW_MEMORY_TARGET.
+"""
+import os
+import sys
+import gc
+import glob
+import json
+import time
+import shutil
+import platform
+import argparse
+import multiprocessing
+import tempfile
+import tracemalloc
+import subprocess
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+import synth
+
+def timed(func, repeat):
+    """
+    Run func repeat times and return the sorted list of times in seconds.
+    """
+    times = []
+    for i in range(repeat):
+        gc.collect()
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return sorted(times)
+
+class Suite(object):
+
+    def __init__(self, path, filenames, repeat):
+        self.path = path
+        self.filenames = filenames
+        self.repeat = repeat
+        self.results = {}
+
+    def run(self, name, func, files=None, setup=None):
+        if files is None:
+            files = len(self.filenames)
+        if setup:
+            times = []
+            for i in range(self.repeat):
+                setup()
+                times.extend(timed(func, 1))
+            times.sort()
+        else:
+            times = timed(func, self.repeat)
+        result = {
+            "seconds": round(times[0], 6),
+            "median": round(times[len(times) // 2], 6),
+            "files": files,
+            "per_file_us": round(times[0] / max(files, 1) * 1000000, 3),
+        }
+        self.results[name] = result
+        print("%-24s %10.2f ms %10.2f us/file" % (name, result["seconds"] * 1000,
+                                                  result["per_file_us"]))
+
+def parse_all(parser_class, filenames):
+    from xdg.Exceptions import ParsingError
+    entries = []
+    for filename in filenames:
+        try:
+            entries.append(parser_class(filename))
+        except ParsingError:
+            pass
+    return entries
+
+# bytes per launcher the launcher list may use, see measure_memory()
+ROW_MEMORY_TARGET = 240
+
+def python_memory(make_index):
+    """
+    Return the number of bytes of Python memory allocated by make_index().
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        index = make_index()
+        (size, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size
+
+def store_memory(rows):
+    """
+    Return the number of bytes GtkListStore copies the strings of rows into,
+    each being a separate allocation which glibc rounds up to 16 bytes with
+    8 bytes of overhead and at least 32 bytes.
+    """
+    size = 0
+    for row in rows:
+        for value in row:
+            if isinstance(value, str):
+                size += max(32, (len(value.encode('utf-8')) + 1 + 8 + 15) // 16 * 16)
+    return size
+
+def measure_memory(filenames):
+    """
+    Return the memory per launcher of the launcher list: the strings copied
+    into the list model plus the Python objects kept for each row. The old
+    rows stored the name, a tooltip and an escaped markup string, with the
+    path of each file mapped to its row; now the model only has the name and
+    the path and the rest is kept in a LauncherRecord.
+    """
+    from xml.sax.saxutils import escape
+    from xdg.Exceptions import ParsingError
+    from dee.launcherinfo import LauncherRecord, get_launcher_info
+
+    infos = []
+    for filename in filenames:
+        try:
+            infos.append(get_launcher_info(filename))
+        except ParsingError:
+            pass
+    count = max(len(infos), 1)
+    # stands in for the GtkTreeIter of a row, the same in both
+    iters = [object() for info in infos]
+
+    old_rows = [(None, i.name, i.filename, escape(i.generic_name or i.name),
+                 escape(i.name), i.icon) for i in infos]
+    old = (store_memory(old_rows) + python_memory(
+        lambda: dict((i.filename, iter) for i, iter in zip(infos, iters))))
+
+    rows = [(None, i.name, i.filename, True) for i in infos]
+    new = (store_memory(rows) + python_memory(
+        lambda: dict((i.filename, LauncherRecord(i, iter))
+                     for i, iter in zip(infos, iters))))
+
+    memory = {
+        "rows": len(infos),
+        "old_row_bytes": round(old / count, 1),
+        "row_bytes": round(new / count, 1),
+        "target_row_bytes": ROW_MEMORY_TARGET,
+    }
+    print("%-24s %10.1f bytes/row" % ("memory_old_row", memory["old_row_bytes"]))
+    print("%-24s %10.1f bytes/row" % ("memory_row", memory["row_bytes"]))
+    return memory
+
+def run_headless(suite):
+    from xdg.DesktopEntry import DesktopEntry
+    from dee.cache import EntryCache
+    from dee.desktopindex import walk_entry_files
+    from dee.launcherinfo import get_launcher_info, parse_launchers
+    from dee.parser import DesktopFile
+
+    apps_dir = os.path.join(suite.path, "applications")
+    filenames = suite.filenames
+
+    suite.run("glob", lambda: glob.glob(os.path.join(apps_dir, "*.desktop")))
+    suite.run("walk", lambda: [os.path.join(d, f) for d, dirs, files
+                               in os.walk(apps_dir) for f in files])
+    suite.run("walk_entry_files", lambda: list(walk_entry_files(apps_dir)))
+    suite.run("parse_pyxdg", lambda: parse_all(DesktopEntry, filenames))
+    suite.run("parse_desktopfile", lambda: parse_all(DesktopFile, filenames))
+    suite.run("parse_launchers", lambda: list(parse_launchers(filenames, 1)))
+    suite.run("parse_launchers_pool",
+              lambda: list(parse_launchers(filenames, multiprocessing.cpu_count())))
+    suite.run("is_read_only", lambda: [os.access(f, os.W_OK) for f in filenames])
+    suite.run("stat", lambda: [os.stat(f) for f in filenames])
+
+    entries = parse_all(DesktopFile, filenames)
+    # the same records as the scanner stores, so that cache_warm loads a
+    # cache of the real size
+    cache = EntryCache(os.path.join(suite.path, "cache", "entries.json"))
+    for entry in entries:
+        cache.set(entry.filename, os.stat(entry.filename),
+                  get_launcher_info(entry.filename)[1:])
+    cache.save()
+
+    from dee.icontheme import IconThemeIndex
+    icon_dirs = [os.path.join(suite.path, "icons")]
+    icons = [entry.getIcon() for entry in entries if os.sep not in entry.getIcon()]
+    def index_icons():
+        index = IconThemeIndex("hicolor", icon_dirs)
+        for icon in icons:
+            index.lookup(icon, 16)
+    suite.run("icon_index_lookup", index_icons, len(icons))
+
+    def warm_cache():
+        cache.load()
+        for filename in filenames:
+            cache.get(filename, os.stat(filename))
+    suite.run("cache_warm", warm_cache)
+
+def run_gtk(suite):
+    import gi
+    gi.require_version('Gtk', '3.0')
+    from gi.repository import GObject, GdkPixbuf, Gtk
+    from dee.entry import Entry
+    from dee.icons import icon_cache
+    from dee.parser import DesktopFile
+
+    entries = parse_all(Entry, suite.filenames)
+    suite.run("parse_entry", lambda: parse_all(Entry, suite.filenames))
+    suite.run("entry_is_read_only", lambda: [e.isReadOnly() for e in entries])
+    suite.run("icon_pixbuf_cold", lambda: [e.getIconPixbuf(16) for e in entries],
+              len(entries), icon_cache.clear)
+    suite.run("icon_pixbuf_warm", lambda: [e.getIconPixbuf(16) for e in entries],
+              len(entries))
+
+    rows = [(None, e.getName(), e.filename, True)
+            for e in parse_all(DesktopFile, suite.filenames)]
+    def append_rows():
+        model = Gtk.ListStore(GdkPixbuf.Pixbuf, GObject.TYPE_STRING,
+                              GObject.TYPE_STRING, GObject.TYPE_BOOLEAN)
+        model.set_sort_column_id(1, Gtk.SortType.ASCENDING)
+        for row in rows:
+            model.append(row)
+    suite.run("model_append", append_rows, len(rows))
+
+def has_display():
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+def compare(results, baseline_file, threshold):
+    """
+    Print the stages which are more than threshold slower than in the
+    baseline file and return True if there are any.
+    """
+    with open(baseline_file) as f:
+        baseline = json.load(f)["stages"]
+    regressed = False
+    for name, result in sorted(results.items()):
+        if name not in baseline or not baseline[name]["per_file_us"]:
+            continue
+        change = result["per_file_us"] / baseline[name]["per_file_us"] - 1
+        if change > threshold:
+            regressed = True
+            print("REGRESSION %-24s %+.0f%%" % (name, change * 100))
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--count", type=int, default=5000,
+                        help="number of desktop entries to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", metavar="FILE",
+                        help="write the results as JSON to FILE")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="compare with the results in FILE")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown when comparing (default: 0.2)")
+    parser.add_argument("--headless", action="store_true",
+                        help="do not run the GTK+ stages")
+    parser.add_argument("--xvfb", action="store_true",
+                        help="run under a virtual X display using xvfb-run")
+    args = parser.parse_args()
+
+    if args.xvfb:
+        argv = [a for a in sys.argv if a != "--xvfb"]
+        sys.exit(subprocess.call(["xvfb-run", "-a", sys.executable] + argv))
+
+    path = tempfile.mkdtemp(prefix="dee-bench-")
+    try:
+        tree = os.path.join(path, "share")
+        filenames = synth.write_tree(tree, args.count, args.seed)
+        # must be set before pyxdg and GTK+ are imported
+        os.environ["XDG_DATA_DIRS"] = tree
+        os.environ["XDG_DATA_HOME"] = os.path.join(path, "home")
+        os.environ["XDG_CACHE_HOME"] = os.path.join(path, "cache")
+
+        suite = Suite(tree, filenames, args.repeat)
+        run_headless(suite)
+        memory = measure_memory(filenames)
+        gtk = not args.headless and has_display()
+        if gtk:
+            run_gtk(suite)
+        else:
+            print("No display, skipping the GTK+ stages")
+    finally:
+        shutil.rmtree(path)
+
+    report = {
+        "meta": {
+            "count": args.count,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "gtk": gtk,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "stages": suite.results,
+        "memory": memory,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    failed = args.compare and compare(suite.results, args.compare, args.threshold)
+    if memory and memory["row_bytes"] > ROW_MEMORY_TARGET:
+        print("MEMORY %.0f bytes/row is over the target of %d"
+              % (memory["row_bytes"], ROW_MEMORY_TARGET))
+        failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Generate a synthetic XDG data tree for benchmarking.
+
+    python benchmarks/synth.py DIR [--count N] [--seed N]
+
+DIR/applications gets COUNT desktop entries (some of them in subdirectories)
+with a mix of localized keys, themed and absolute-path icons, read-only files
+and malformed entries. DIR/icons/hicolor holds a small icon theme providing
+the themed icons, so DIR can be used as the only entry of XDG_DATA_DIRS.
+"""
+import os
+import sys
+import stat
+import zlib
+import struct
+import random
+import argparse
+
+LOCALES = ("de", "fr", "es", "it", "ja", "pt_BR", "ru", "zh_CN", "nl", "pl",
+           "sv", "cs", "fi", "ko", "tr", "da", "hu", "nb", "uk", "el")
+CATEGORIES = ("AudioVideo", "Development", "Education", "Game", "Graphics",
+              "Network", "Office", "Science", "Settings", "System", "Utility")
+ICON_SIZES = (16, 22, 24, 32, 48)
+THEMED_ICONS = 50
+
+# fractions of the generated entries
+READ_ONLY = 0.3
+MALFORMED = 0.02
+ABSOLUTE_ICON = 0.1
+MISSING_ICON = 0.05
+SUBDIRECTORY = 0.1
+
+def png_data(size, color):
+    """
+    Return the bytes of a size x size PNG filled with color, an (r, g, b) tuple.
+    """
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data +
+                struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff))
+    row = b"\x00" + bytes(bytearray(color)) * size
+    return (b"\x89PNG\r\n\x1a\n" +
+            chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)) +
+            chunk(b"IDAT", zlib.compress(row * size)) +
+            chunk(b"IEND", b""))
+
+def write_icon_theme(path, rng):
+    """
+    Write a hicolor icon theme with THEMED_ICONS icons at each of ICON_SIZES.
+    """
+    theme_dir = os.path.join(path, "icons", "hicolor")
+    directories = ["%dx%d/apps" % (size, size) for size in ICON_SIZES]
+    for size, directory in zip(ICON_SIZES, directories):
+        os.makedirs(os.path.join(theme_dir, directory))
+        for i in range(THEMED_ICONS):
+            color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+            with open(os.path.join(theme_dir, directory,
+                                   "bench-icon-%d.png" % i), 'wb') as f:
+                f.write(png_data(size, color))
+    with open(os.path.join(theme_dir, "index.theme"), 'w') as f:
+        f.write("[Icon Theme]\nName=Hicolor\nComment=Fallback\n")
+        f.write("Directories=%s\n\n" % ",".join(directories))
+        for size, directory in zip(ICON_SIZES, directories):
+            f.write("[%s]\nSize=%d\nContext=Applications\nType=Threshold\n\n"
+                    % (directory, size))
+
+def entry_text(i, rng, icons_dir):
+    """
+    Return the contents of the i'th synthetic desktop entry.
+    """
+    lines = ["[Desktop Entry]", "Type=Application", "Version=1.0",
+             "Name=Benchmark Application %d" % i]
+    locales = rng.sample(LOCALES, rng.randint(0, len(LOCALES)))
+    lines.extend("Name[%s]=Application %d (%s)" % (l, i, l) for l in locales)
+    lines.append("GenericName=Benchmark Tool %d" % (i % 37))
+    lines.extend("GenericName[%s]=Tool %d (%s)" % (l, i % 37, l)
+                 for l in locales[:5])
+    lines.append("Comment=Synthetic desktop entry number %d" % i)
+    r = rng.random()
+    if r < ABSOLUTE_ICON:
+        lines.append("Icon=%s" % os.path.join(icons_dir, "app-%d.png" % (i % 20)))
+    elif r < ABSOLUTE_ICON + MISSING_ICON:
+        lines.append("Icon=no-such-icon-%d" % i)
+    else:
+        lines.append("Icon=bench-icon-%d" % rng.randrange(THEMED_ICONS))
+    lines.append("Exec=bench-app-%d --open %%U" % i)
+    lines.append("TryExec=bench-app-%d" % i)
+    lines.append("Terminal=%s" % rng.choice(("true", "false")))
+    lines.append("Categories=%s;" % ";".join(rng.sample(CATEGORIES, 2)))
+    lines.append("Keywords=bench;synthetic;app%d;" % i)
+    lines.append("StartupNotify=true")
+    return "\n".join(lines) + "\n"
+
+def malformed_text(i, rng):
+    return rng.choice((
+        "Name=No group header %d\n" % i,
+        "[Desktop Entry]\nName=Broken %d\nthis line has no equals sign\n" % i,
+        "[Not A Desktop Entry]\nName=Wrong group %d\n" % i,
+    ))
+
+def write_tree(path, count, seed=0):
+    """
+    Write the synthetic tree to path and return the list of desktop files.
+    """
+    rng = random.Random(seed)
+    apps_dir = os.path.join(path, "applications")
+    icons_dir = os.path.join(path, "pixmaps")
+    os.makedirs(os.path.join(apps_dir, "bench"))
+    os.makedirs(icons_dir)
+    write_icon_theme(path, rng)
+    for i in range(20):
+        with open(os.path.join(icons_dir, "app-%d.png" % i), 'wb') as f:
+            f.write(png_data(48, (i * 12, 100, 200)))
+
+    filenames = []
+    for i in range(count):
+        if rng.random() < SUBDIRECTORY:
+            filename = os.path.join(apps_dir, "bench", "app-%d.desktop" % i)
+        else:
+            filename = os.path.join(apps_dir, "bench-app-%d.desktop" % i)
+        if rng.random() < MALFORMED:
+            text = malformed_text(i, rng)
+        else:
+            text = entry_text(i, rng, icons_dir)
+        with open(filename, 'w') as f:
+            f.write(text)
+        if rng.random() < READ_ONLY:
+            os.chmod(filename, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        filenames.append(filename)
+    return filenames
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("path", metavar="DIR")
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if os.path.exists(args.path):
+        sys.exit("%s already exists" % args.path)
+    filenames = write_tree(args.path, args.count, args.seed)
+    print("Wrote %d desktop entries to %s" % (len(filenames), args.path))
+
+if __name__ == "__main__":
+    main()
@@ -8,12 +8,24 @@ sys.path.insert(1, os.path.join(os.path.dirname(__file__), 'src'))
 
 print(sys.path)
 
-try:
-    from dee.application import Application 
-except ImportError as e:
-    sys.exit(str(e))
- 
+# the worker processes of the headless tools and of the launcher list import
+# this script again as __mp_main__, so everything is done under __main__
 if __name__ == "__main__":
+    # --trace FILE or $DEE_TRACE writes a Chrome trace of the hot paths on exit
+    from dee import trace
+    sys.argv[1:] = trace.enable_from_args(sys.argv[1:])
+
+    if len(sys.argv) > 1:
+        from dee.cli import main
+        sys.exit(main(sys.argv[1:]))
+
+    try:
+        from dee import timing
+        from dee.application import Application 
+        timing.mark("imports")
+    except ImportError as e:
+        sys.exit(str(e))
+
     # work around Gtk.main disabling ctrl-c (gnome bug #622084)
     signal.signal(signal.SIGINT, signal.SIG_DFL)
     app = Application('desktop-entry-editor', 
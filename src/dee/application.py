@@ -1,9 +1,9 @@
 import os
-import glob
 import sys
 import logging
-import subprocess
-import tempfile
+import time
+import threading
+from collections import OrderedDict
 
 import gi
 gi.require_version('Gtk', '3.0')
@@ -11,12 +11,23 @@ gi.require_version('Gdk', '3.0')
 gi.require_version('Pango', '1.0')
 
 from gi.repository import GObject, Gio
-from gi.repository import Pango
 from gi.repository import Gdk, GdkPixbuf, Gtk, GLib
-from gi.repository import GtkSource
 
-from dee.entry import Entry, get_icon_pixbuf
+from dee import timing
+from dee import trace
+from dee.categories import CategoryIndex, get_category_groups
 from dee.exceptiondialog import ExceptionDialog
+from dee.execline import expand_field_codes
+from dee.icons import get_icon_pixbuf, get_theme_index, icon_cache
+from dee.icons import load_icon_pixbuf_async
+from dee.icontheme import IconThemeIndex
+from dee.launch import LaunchTest
+from dee.launcherinfo import LauncherRecord, get_launcher_info, get_search_texts
+from dee.monitor import ApplicationsMonitor
+from dee.saver import FileSaver
+from dee.scanner import LauncherScanner
+from dee.search import SearchIndex
+from dee.textdiff import line_changes, split_lines
 from xdg.Exceptions import  ParsingError, ValidationError
 from xdg.BaseDirectory import xdg_data_dirs, xdg_data_home
 
@@ -37,6 +48,9 @@ class Application(object):
     BASIC_TAB = 0
     ADVANCED_TAB = 1
     SOURCE_TAB = 2
+    TYPING_DELAY = 150 # milliseconds
+    # values of the launcher-view setting, in the order of the View menu
+    LAUNCHER_VIEWS = ("flat", "categories", "menu")
 
     # http://standards.freedesktop.org/desktop-entry-spec/latest/ar01s05.html
     ALL_KEYS = (
@@ -142,6 +156,7 @@ class Application(object):
         """
         if debug:
             logger.setLevel(logging.DEBUG)
+            logging.getLogger("dee").setLevel(logging.DEBUG)
 
         self.PACKAGE = package
         self.VERSION = version
@@ -159,17 +174,33 @@ class Application(object):
         except Exception as e:
             logger.debug(self.UI_DIR)
             sys.exit(str(e))
+        timing.mark("builder")
         self.window = builder.get_object("main_window")
+        self.window.connect("draw", self._on_first_draw)
         self.window.set_icon_name(self.PACKAGE)
         self._notebook = builder.get_object("notebook")
         self._statusbar = builder.get_object("statusbar")
         self._statusbar_ctx = self._statusbar.get_context_id("Selected entry.")
+        self._launch_status_ctx = self._statusbar.get_context_id("Launch test.")
+        self._progressbar = Gtk.ProgressBar()
+        self._progressbar.set_show_text(True)
+        self._progressbar.set_no_show_all(True)
+        self._statusbar.pack_end(self._progressbar, False, False, 0)
+        self._scanner = None
+        self._first_rows_shown = False
+        self._list_loaded = False
+        self._monitor = ApplicationsMonitor(xdg_data_dirs,
+                                            self._on_launchers_changed)
+        self._saver = FileSaver()
         self._init_settings()
         self._init_menu_and_toolbar(builder)
         self._init_treeview(builder)
         self._init_basic_tab(builder)
-        self._init_advanced_tab(builder)
-        self._init_source_tab(builder)
+        # the advanced and source tabs are built when first shown
+        self._builder = builder
+        self._advanced_treeview = None
+        self._sourceview = None
+        self._source_update_id = None
 
         self._type_application_widgets = (
             builder.get_object("terminal_label"),
@@ -189,6 +220,7 @@ class Application(object):
         builder.connect_signals(self)
         self._state = self.STATE_NORMAL
         self.close_file()
+        timing.mark("window-init")
 
     def _init_settings(self):
         """
@@ -197,11 +229,20 @@ class Application(object):
         self._settings = Gio.Settings.new(SETTINGS_SCHEMA)
         self._settings.connect("changed::show-read-only-files",
                                lambda settings,key: self._load_treeview())
+        self._view_handler = self._settings.connect("changed::launcher-view",
+                               lambda settings,key: self._set_launcher_view(
+                                    settings.get_string(key)))
+        icon_cache.set_max_size(self._settings.get_int("icon-cache-size"))
+        self._settings.connect("changed::icon-cache-size",
+                               lambda settings,key: icon_cache.set_max_size(
+                                    settings.get_int(key)))
 
     def _init_source_tab(self, builder):
         """
         Initialize a GtkSourceView to show the desktop entry in the 'Source' tab
         """
+        # GtkSource and Pango are only loaded once the tab is first shown
+        from gi.repository import GtkSource, Pango
         scrolled_window = builder.get_object("source_scrolled_window")
         # why do I have to explicity create the buffer?
         self._sourceview = GtkSource.View.new_with_buffer(GtkSource.Buffer())
@@ -225,26 +266,121 @@ class Application(object):
         self._treeview = builder.get_object("treeview")
         # why doesn't button-press-event work when defined in Glade?
         self._treeview.connect("button-press-event", self.on_treeview_button_press_event)
+        # everything else about a launcher is kept in its LauncherRecord, the
+        # markup and tooltip are only built for rows which are drawn or hovered
         model = Gtk.ListStore(GdkPixbuf.Pixbuf,         # icon
                               GObject.TYPE_STRING,      # name
                               GObject.TYPE_STRING,      # desktop entry file
-                              GObject.TYPE_STRING,      # tooltip
-                              GObject.TYPE_STRING)      # markup
+                              GObject.TYPE_BOOLEAN)     # matches search
         model.set_sort_column_id(1, Gtk.SortType.ASCENDING)
-        self._treeview.set_model(model)
+        self._launcher_store = model
+        # the search only flips the "matches search" column of the rows whose
+        # state changed, the filter itself never has to call back into Python
+        filter = model.filter_new()
+        filter.set_visible_column(3)
+        self._flat_model = filter
+        self._treeview.set_model(filter)
         self._treeview.set_headers_visible(False)
-
+        self._treeview.get_selection().set_mode(Gtk.SelectionMode.MULTIPLE)
+        self._treeview.connect("query-tooltip", self.on_treeview_query_tooltip)
+        self._search_entry = builder.get_object("search_entry")
+        self._search_index = SearchIndex()
+        self._search_matches = None
+
+        # icons are only loaded for rows which are drawn, so every row has the
+        # same height and only the visible rows need to be measured
         column = Gtk.TreeViewColumn("Launchers")
+        column.set_sizing(Gtk.TreeViewColumnSizing.FIXED)
         cell = Gtk.CellRendererPixbuf()
         column.pack_start(cell, False)
-        column.add_attribute(cell, "pixbuf", 0)
+        column.set_cell_data_func(cell, self._launcher_icon_data_func)
         cell = Gtk.CellRendererText()
         column.pack_start(cell, True)
-        column.add_attribute(cell, "markup", 4)
+        column.set_cell_data_func(cell, self._launcher_name_data_func)
+        # flags launchers with problems found by Tools > Audit
+        cell = Gtk.CellRendererPixbuf()
+        cell.set_property("icon-name", "dialog-warning")
+        column.pack_end(cell, False)
+        column.set_cell_data_func(cell, self._launcher_problem_data_func)
         self._treeview.append_column(column)
+        self._treeview.set_fixed_height_mode(True)
+        self._audit_problems = {}
 
         self._missing_pixbuf = self.window.render_icon_pixbuf(Gtk.STOCK_MISSING_IMAGE,
                                                               Gtk.IconSize.MENU)
+        # ListStore iters persist, so the record of each desktop file holds
+        # the iter of its row to update single rows when a file changes
+        self._launchers = {}
+        self._icon_queue = OrderedDict()  # filenames, as an ordered set
+        self._icon_source = None
+        self._desktop_index = None
+        self._queued_changes = None     # paths changed before it was built
+        self._launcher_menu = None
+
+        # the grouped views are built from the category index, which is kept
+        # up to date along with the list, instead of from the files
+        self._category_index = CategoryIndex()
+        self._get_groups = None
+        self._menu_layout = None
+        self._group_store = None
+        self._group_model = None
+        self._group_rows = {}       # filename -> [(group path, TreeStore iter)]
+        self._group_iters = {}      # group path -> TreeStore iter
+        self._set_launcher_view(self._settings.get_string("launcher-view"))
+
+    def _launcher_icon_data_func(self, column, cell, model, iter, data=None):
+        """
+        Render the launcher's icon, showing a placeholder and queueing the icon
+        to be loaded if it has not been loaded yet.
+        """
+        filename = model.get_value(iter, 2)
+        if filename is None:
+            cell.set_property("icon-name", "folder")
+            return
+        # the grouped views share the icons loaded into the list
+        pixbuf = self._launcher_store.get_value(self._launchers[filename].iter, 0)
+        if pixbuf is None:
+            pixbuf = self._missing_pixbuf
+            if filename not in self._icon_queue:
+                self._icon_queue[filename] = None
+            if not self._icon_source:
+                self._icon_source = GLib.idle_add(self._load_queued_icons,
+                                                  priority=GLib.PRIORITY_LOW)
+        cell.set_property("pixbuf", pixbuf)
+
+    def _launcher_name_data_func(self, column, cell, model, iter, data=None):
+        markup = GLib.markup_escape_text(model.get_value(iter, 1))
+        filename = model.get_value(iter, 2)
+        if filename is None:
+            markup = "<b>%s</b>" % markup
+        elif self._launchers[filename].read_only:
+            markup = "<span color='#888888'>%s</span>" % markup
+        cell.set_property("markup", markup)
+
+    def _launcher_problem_data_func(self, column, cell, model, iter, data=None):
+        cell.set_property("visible", model.get_value(iter, 2) in self._audit_problems)
+
+    def _load_queued_icons(self):
+        """
+        Idle callback to load the icons of the rows which have been drawn. Icons
+        are loaded for a few milliseconds at a time to keep the UI responsive.
+        """
+        deadline = time.time() + 0.01
+        while self._icon_queue and time.time() < deadline:
+            # the icon is read from the record when it is loaded, so a
+            # launcher whose icon changed while queued gets its new icon
+            filename = self._icon_queue.popitem(last=False)[0]
+            record = self._launchers.get(filename)
+            if record is None:
+                continue
+            self._launcher_store.set_value(record.iter, 0,
+                                           get_icon_pixbuf(record.icon, 16))
+        if self._group_store is not None:
+            self._treeview.queue_draw()
+        if self._icon_queue:
+            return True
+        self._icon_source = None
+        return False
 
     def _init_advanced_tab(self, builder):
         """
@@ -259,6 +395,15 @@ class Application(object):
         treeview.set_model(model)
         treeview.set_headers_visible(True)
 
+        # the rows are kept and only changed values are updated, the tooltips
+        # are escaped once
+        self._key_tooltips = {}
+        self._advanced_rows = {}
+        for key, tooltip, t in self.ALL_KEYS:
+            self._key_tooltips[key] = GLib.markup_escape_text(tooltip)
+            self._advanced_rows[key] = model.append((key, "",
+                                                     self._key_tooltips[key],))
+
         column = Gtk.TreeViewColumn("Key")
         cell = Gtk.CellRendererText()
         column.pack_start(cell, True)
@@ -298,6 +443,12 @@ class Application(object):
         self._type_combo.set_id_column(0)
         self._type_combo.set_active_id("Application")
 
+        # values typed into the entries are applied once the user pauses
+        self._pending_values = {}
+        self._pending_values_id = None
+        self._icon_preview_id = None
+        self._icon_preview_cancellable = None
+
     def _init_menu_and_toolbar(self, builder):
         """
         Load the menu and toolbar from the UI definitions file.
@@ -331,6 +482,12 @@ class Application(object):
             #('ViewToolbar', None, "_Toolbar", None, None,
             #    self.on_view_toolbar_toggled, False),
         ])
+        self._app_actions.add_radio_actions([
+            ('ViewFlat', None, "_Flat List", None, None, 0),
+            ('ViewCategories', None, "By _Category", None, None, 1),
+            ('ViewMenu', None, "By _Menu", None, None, 2),
+        ], self.LAUNCHER_VIEWS.index(self._settings.get_string("launcher-view")),
+           self.on_view_launchers_changed)
 
         self._save_actions = Gtk.ActionGroup("SaveActions")
         self._save_actions.add_actions([
@@ -349,9 +506,26 @@ class Application(object):
                 self.on_tools_validate_activate),
         ])
 
+        self._batch_actions = Gtk.ActionGroup("BatchActions")
+        self._batch_actions.add_actions([
+            ('BatchEdit', None, "_Batch Edit...", None,
+                "Change the selected files at once",
+                self.on_tools_batch_edit_activate),
+        ])
+        self._batch_actions.set_sensitive(False)
+
+        self._audit_actions = Gtk.ActionGroup("AuditActions")
+        self._audit_actions.add_actions([
+            ('Audit', None, "_Audit Launchers", None,
+                "Check that the programs and icons of all launchers are installed",
+                self.on_tools_audit_activate),
+        ])
+
         manager.insert_action_group(self._app_actions)
         manager.insert_action_group(self._save_actions)
         manager.insert_action_group(self._open_actions)
+        manager.insert_action_group(self._batch_actions)
+        manager.insert_action_group(self._audit_actions)
 
         ui_file = os.path.join(self.UI_DIR, 'menu_toolbar.ui')
         manager.add_ui_from_file(ui_file)
@@ -394,17 +568,21 @@ class Application(object):
         sys.excepthook = new_hook
         return old_hook
 
+    @trace.traced("load_entry_ui")
     def _load_desktop_entry_ui(self):
         """
         Load the current Entry into the various widgets of the GUI.
         """
+        # values typed for the previous entry must not be applied to this one
+        self._discard_pending_values()
         self._state = self.STATE_LOADING
         entry = self._entry
         self._update_ui()
         if not entry:
             # clear all
             self._status_pop()
-            self._sourceview.get_buffer().set_text("")
+            if self._sourceview:
+                self._sourceview.get_buffer().set_text("")
             self._type_combo.set_active_id("Application")
             self._name_entry.set_text("")
             self._icon_entry.set_text("")
@@ -433,52 +611,354 @@ class Application(object):
 
     def _load_treeview(self):
         """
-        Load the treeview with the .desktop entries found at path.
+        Load the treeview with the .desktop entries found in the XDG data dirs.
+
+        The files are parsed by a LauncherScanner in a worker thread and the
+        rows are added as each batch arrives, so the UI stays responsive.
         """
+        if self._scanner and self._scanner.is_running():
+            self._scanner.cancel()
+            # the changes are read again with the rest of the files
+            self._queued_changes = None
+            self._on_scan_done()
 
         self._treeview.get_bin_window().set_cursor(Gdk.Cursor(Gdk.CursorType.WATCH))
         self._status_push("Loading...")
-        while Gtk.events_pending():
-            Gtk.main_iteration()
+        self._progressbar.set_fraction(0.0)
+        self._progressbar.show()
 
-        model = self._treeview.get_model()
-        model.clear()
-        #
-        show_ro = self._settings.get_boolean('show-read-only-files')
-        for path in xdg_data_dirs:
-            path = os.path.join(path, "applications")
-            logger.debug("Loading desktop entries from %s" % path)
-            for desktop_file in glob.glob(os.path.join(path, u"*.desktop")):
-                #logger.debug(desktop_file)
-                try:
-                    entry = Entry(desktop_file)
-                except ParsingError as e:
-                    logger.warn(e)
-                    continue # skip entries with parse errors
+        self._launcher_store.clear()
+        self._launchers.clear()
+        self._search_index.clear()
+        self._category_index.clear()
+        self._build_group_store()
+        self._icon_queue.clear()
+        self._desktop_index = None
+        self._queued_changes = OrderedDict()
+        self._scanner = LauncherScanner(xdg_data_dirs,
+                                        self._on_scan_batch,
+                                        self._on_scan_done,
+                                        self._on_scan_progress,
+                                        index_callback=self._on_scan_index)
+        self._scanner.start()
 
-                pixbuf = entry.getIconPixbuf(16)
+    def _on_scan_index(self, index):
+        """
+        Keep the DesktopFileIndex built by the scanner to resolve which file
+        takes effect when files change.
+        """
+        self._desktop_index = index
+        self._apply_queued_changes()
+
+    def _apply_queued_changes(self):
+        """
+        Update the rows of the files which changed while the scanner was
+        still indexing the desktop file IDs.
+        """
+        paths = self._queued_changes
+        self._queued_changes = None
+        if paths:
+            self._on_launchers_changed(list(paths))
 
-                if entry.getGenericName():
-                    tooltip = entry.getGenericName()
+    def _on_scan_batch(self, batch):
+        """
+        Add a batch of LauncherInfo objects from the scanner to the treeview.
+        """
+        show_ro = self._settings.get_boolean('show-read-only-files')
+        with trace.span("model.insert", rows=len(batch)):
+            for info in batch:
+                self._set_launcher_row(info, show_ro)
+            if self._search_matches is not None:
+                self._apply_search()
+        if not self._first_rows_shown:
+            self._first_rows_shown = True
+            timing.mark("list-first-rows")
+
+    def _on_launchers_changed(self, paths):
+        """
+        Update the rows of the desktop files which the ApplicationsMonitor
+        reported as created, changed or deleted.
+        """
+        if self._queued_changes is not None:
+            # until the scanner has indexed the desktop file IDs, it is not
+            # known which file takes effect, and an overridden file would be
+            # shown next to its override
+            self._queued_changes.update((path, None) for path in paths)
+            return
+        show_ro = self._settings.get_boolean('show-read-only-files')
+        index = self._desktop_index
+        for path in paths:
+            if index is None:
+                effective = path
+            else:
+                # a change can make a different file take effect for the ID,
+                # such as deleting a user override of a system launcher
+                desktop_id = index.get_id(path)
+                old_effective = index.lookup(desktop_id)
+                if os.path.exists(path):
+                    index.add(path)
                 else:
-                    tooltip = entry.getName()
-                tooltip = GLib.markup_escape_text(tooltip)
+                    index.remove(path)
+                effective = index.lookup(desktop_id)
+                if old_effective and old_effective != effective:
+                    self._remove_launcher_row(old_effective)
+                if effective != path and effective == old_effective:
+                    continue # an overridden file changed
+            if not effective or not os.path.exists(effective):
+                self._remove_launcher_row(path)
+                continue
+            try:
+                info = get_launcher_info(effective)
+            except ParsingError as e:
+                logger.warn(e)
+                self._remove_launcher_row(effective)
+                continue
+            self._set_launcher_row(info, show_ro)
+        if self._search_matches is not None:
+            self._apply_search()
+
+    def _apply_search(self):
+        """
+        Show only the launchers matching the text in the search entry.
+        """
+        matches = self._search_index.search(self._search_entry.get_text())
+        launchers = self._launchers
+        if self._search_matches is None:
+            shown = set(launchers)
+        else:
+            shown = self._search_matches
+        if matches is None:
+            wanted = set(launchers)
+        else:
+            wanted = matches
+        self._search_matches = matches
+        for filename in shown ^ wanted:
+            record = launchers.get(filename)
+            if record is not None:
+                self._launcher_store.set_value(record.iter, 3, filename in wanted)
+            for path, iter in self._group_rows.get(filename, ()):
+                self._group_store.set_value(iter, 3, filename in wanted)
+        if self._group_store is not None:
+            self._update_group_visibility()
+
+    def _remove_launcher_row(self, filename):
+        """
+        Remove the row for the desktop file if it is in the treeview.
+        """
+        record = self._launchers.pop(filename, None)
+        if record is not None:
+            self._launcher_store.remove(record.iter)
+            self._search_index.remove(filename)
+            self._category_index.remove(filename)
+            self._remove_group_rows(filename)
+
+    def _set_launcher_row(self, info, show_ro):
+        """
+        Add or update the row for a LauncherInfo object.
+        """
+        if info.read_only and not show_ro:
+            self._remove_launcher_row(info.filename)
+            return # skip read-only per settings
+
+        self._search_index.add(info.filename, get_search_texts(info))
+        desktop_id = None
+        if self._desktop_index:
+            desktop_id = self._desktop_index.get_id(info.filename)
+        self._category_index.add(info.filename, desktop_id, info.categories)
+        model = self._launcher_store
+        old_record = self._launchers.get(info.filename)
+        record = LauncherRecord(info)
+        self._launchers[info.filename] = record
+        if old_record is None:
+            # the icon is loaded when the row is first drawn, and while a search
+            # is active new rows stay hidden until _apply_search() checks them
+            visible = self._search_matches is None
+            record.iter = model.append((None, info.name, info.filename, visible,))
+        else:
+            record.iter = old_record.iter
+            if old_record.icon != record.icon:
+                model.set_value(record.iter, 0, None)
+            # setting the name also redraws the row
+            model.set_value(record.iter, 1, info.name)
+        if self._group_store is not None:
+            self._add_group_rows(info.filename, info.name)
+
+    def _set_launcher_view(self, view):
+        """
+        Show the launchers in a flat list ("flat"), grouped by their main
+        categories ("categories") or grouped as in the applications menu
+        ("menu"). The groups come from the category index, so switching views
+        never reads the files again.
+        """
+        self._get_groups = None
+        if view == "menu":
+            if self._menu_layout is None:
+                from dee.menu import MenuLayout
+                try:
+                    self._menu_layout = MenuLayout()
+                except (IOError, ParsingError) as e:
+                    logger.warn("Cannot read the applications menu: %s" % e)
+                    view = "categories"
+                    self._select_launcher_view(view)
+            if self._menu_layout is not None:
+                self._get_groups = self._get_menu_groups
+        if view == "categories":
+            self._get_groups = lambda desktop_id, categories: \
+                                    get_category_groups(categories)
+        self._build_group_store()
+
+    def _select_launcher_view(self, view):
+        """
+        Select view in the View menu and save it in the launcher-view setting
+        without switching to it, for when a different view than the one chosen
+        is shown.
+        """
+        # the radio actions report changes through the first of the group
+        action = self._app_actions.get_action("ViewFlat")
+        action.handler_block_by_func(self.on_view_launchers_changed)
+        action.set_current_value(self.LAUNCHER_VIEWS.index(view))
+        action.handler_unblock_by_func(self.on_view_launchers_changed)
+        self._settings.handler_block(self._view_handler)
+        self._settings.set_string("launcher-view", view)
+        self._settings.handler_unblock(self._view_handler)
+
+    def _get_menu_groups(self, desktop_id, categories):
+        # launchers which are in no menu would otherwise not be shown at all
+        return (self._menu_layout.get_paths(desktop_id, categories) or
+                [("Not in Menu",)])
+
+    @trace.traced("group.build")
+    def _build_group_store(self):
+        """
+        Build the rows of the grouped view from the category index, and show
+        the grouped view or the flat list.
+        """
+        self._group_rows = {}
+        self._group_iters = {}
+        self._group_model = None
+        if self._get_groups is None:
+            self._group_store = None
+            self._treeview.set_model(self._flat_model)
+            return
+        self._group_store = Gtk.TreeStore(GdkPixbuf.Pixbuf,    # unused
+                                          GObject.TYPE_STRING, # name
+                                          GObject.TYPE_STRING, # file, None for groups
+                                          GObject.TYPE_BOOLEAN)# matches search
+        for filename in self._category_index:
+            record = self._launchers[filename]
+            self._add_group_rows(filename,
+                                 self._launcher_store.get_value(record.iter, 1))
+        # sorting once all rows are in is much faster than sorted inserts
+        self._group_store.set_sort_column_id(1, Gtk.SortType.ASCENDING)
+        self._update_group_visibility()
+        self._group_model = self._group_store.filter_new()
+        self._group_model.set_visible_column(3)
+        self._treeview.set_model(self._group_model)
+        self._treeview.expand_all()
+
+    def _get_group_iter(self, path):
+        """
+        Return the row of the group path, a tuple of group names, adding it
+        and its parent groups if they do not exist yet.
+        """
+        iter = self._group_iters.get(path)
+        if iter is None:
+            parent = None
+            if len(path) > 1:
+                parent = self._get_group_iter(path[:-1])
+            iter = self._group_store.append(parent, (None, path[-1], None, True))
+            self._group_iters[path] = iter
+            if self._group_model is not None and parent is not None:
+                self._expand_group(parent)
+        return iter
+
+    def _expand_group(self, iter):
+        path = self._group_model.convert_child_path_to_path(
+                                            self._group_store.get_path(iter))
+        if path is not None:
+            self._treeview.expand_to_path(path)
+
+    def _add_group_rows(self, filename, name):
+        """
+        Add the rows of the launcher to the groups it belongs in, replacing
+        any rows it had.
+        """
+        self._remove_group_rows(filename)
+        (desktop_id, categories) = self._category_index.get(filename)
+        visible = (self._search_matches is None or
+                   filename in self._search_matches)
+        rows = []
+        for path in self._get_groups(desktop_id, categories):
+            if path:
+                parent = self._get_group_iter(path)
+                new_group = self._group_store.iter_n_children(parent) == 0
+            else:
+                (parent, new_group) = (None, False)
+            iter = self._group_store.append(parent, (None, name, filename,
+                                                     visible))
+            rows.append((path, iter))
+            if new_group and self._group_model is not None:
+                self._expand_group(parent)
+        self._group_rows[filename] = rows
+
+    def _remove_group_rows(self, filename):
+        """
+        Remove the rows of the launcher from the grouped view, and the groups
+        which are left empty.
+        """
+        for path, iter in self._group_rows.pop(filename, ()):
+            self._group_store.remove(iter)
+            while path:
+                group = self._group_iters[path]
+                if self._group_store.iter_has_child(group):
+                    break
+                self._group_store.remove(group)
+                del self._group_iters[path]
+                path = path[:-1]
 
-                markup = GLib.markup_escape_text(entry.getName())
-                if entry.isReadOnly():
-                    if show_ro:
-                        markup = "<span color='#888888'>%s</span>" % markup
-                    else:
-                        continue # skip read-only per settings
+    def _update_group_visibility(self):
+        """
+        Hide the groups without any launcher matching the search.
+        """
+        visible = set()
+        for filename, rows in self._group_rows.items():
+            if self._search_matches is None or filename in self._search_matches:
+                for path, iter in rows:
+                    for i in range(1, len(path) + 1):
+                        visible.add(path[:i])
+        for path, iter in self._group_iters.items():
+            if self._group_store.get_value(iter, 3) != (path in visible):
+                self._group_store.set_value(iter, 3, path in visible)
 
-                model.append((pixbuf, entry.getName(), desktop_file, tooltip, markup,))
+    def _on_scan_done(self):
+        """
+        Restore the UI once the scanner has finished or has been cancelled.
+        """
+        self._progressbar.hide()
         self._treeview.get_bin_window().set_cursor(None)
         self._status_pop()
+        # the scan failed before indexing the IDs if changes are still queued
+        self._apply_queued_changes()
+        logger.debug("Icon cache: %d hits, %d misses" % (icon_cache.hits,
+                                                          icon_cache.misses))
+        if not self._list_loaded:
+            self._list_loaded = True
+            timing.mark("list-loaded")
+            timing.report()
+
+    def _on_scan_progress(self, scanned, total):
+        """
+        Show the scanner's progress in the statusbar.
+        """
+        if total:
+            self._progressbar.set_fraction(float(scanned) / total)
+            self._progressbar.set_text("%d of %d" % (scanned, total))
 
     def new_file(self):
         """
         Create a new, empty desktop entry.
         """
+        from dee.entry import Entry
         old_entry = self._entry
         self._entry = Entry()
         filename = self.save_dialog()
@@ -489,6 +969,7 @@ class Application(object):
             self._entry.set("Name", "Untitled")
             logger.debug(self._entry.getName())
             self.save_file(filename)
+            self._load_desktop_entry_ui()
             return
         self._entry = old_entry
 
@@ -505,20 +986,61 @@ class Application(object):
         type_str = combo.get_model()[combo.get_active()][0]
         self._ui_value_changed("Type", type_str)
         if self._entry:
+            # the basic tab is reloaded from the entry, which would lose what
+            # was typed but not applied yet
+            self._flush_pending_values()
             self._update_basic_tab()
 
     def on_exec_entry_changed(self, entry, data=None):
-        self._ui_value_changed("Exec", entry.get_text())
+        self._queue_value_changed("Exec", entry.get_text())
 
     def on_exec_entry_icon_press(self, entry, icon_pos, event, data=None):
         """
-        Execute the command when the user presses the icon in the entry.
+        Execute the command when the user presses the icon in the entry, and
+        report how long it took to show a window and to exit.
         """
-        # TODO async? Wait for retval?
         if not self._entry:
             return
-        retval = subprocess.call(self._entry.getExec(), shell=True)
-        logger.debug("Exited with code " + str(retval))
+        self._flush_pending_values()
+        entry = self._entry
+        argv = expand_field_codes(entry.getExec(), name=entry.getName(),
+                                  icon=entry.getIcon(), location=entry.filename)
+        if not argv:
+            self.error_dialog("The command could not be parsed.")
+            return
+        self._start_launch_test(argv, entry.getStartupWMClass(),
+                                entry.getPath() or None)
+
+    def _start_launch_test(self, argv, wm_class=None, working_directory=None):
+        """
+        Run argv in the background, reporting its progress in the statusbar.
+        """
+        program = os.path.basename(argv[0])
+        test = LaunchTest(argv, self._on_launch_test_exit,
+                          self._on_launch_test_window, wm_class,
+                          working_directory)
+        try:
+            test.start()
+        except GLib.GError as e:
+            self.error_dialog("Could not run %s: %s" % (program, e.message))
+            return
+        self._launch_status("Started %s" % program)
+
+    def _launch_status(self, status):
+        self._statusbar.pop(self._launch_status_ctx)
+        self._statusbar.push(self._launch_status_ctx, status)
+
+    def _on_launch_test_window(self, test):
+        self._launch_status("%s showed a window after %.2f s"
+                            % (os.path.basename(test.argv[0]), test.window_time))
+
+    def _on_launch_test_exit(self, test):
+        status = "%s exited with status %d after %.2f s" % (
+                    os.path.basename(test.argv[0]), test.exit_status,
+                    test.exit_time)
+        if test.window_time is not None:
+            status += " (first window after %.2f s)" % test.window_time
+        self._launch_status(status)
 
     def on_file_close_activate(self, action, data=None):
         self.close_file()
@@ -559,10 +1081,31 @@ class Application(object):
         """
         Update the primary icon as the user enters text.
         """
-        icon = entry.get_text()
-        self._ui_value_changed("Icon", icon)
+        self._queue_value_changed("Icon", entry.get_text())
+        if self._icon_preview_id:
+            GLib.source_remove(self._icon_preview_id)
+        if self._state == self.STATE_LOADING:
+            self._update_icon_preview()
+        else:
+            self._icon_preview_id = GLib.timeout_add(self.TYPING_DELAY,
+                                                     self._update_icon_preview)
+
+    def _update_icon_preview(self):
+        """
+        Start loading the icon named in the icon entry. A load still running
+        for an earlier name is cancelled so that its result is dropped.
+        """
+        self._icon_preview_id = None
+        if self._icon_preview_cancellable:
+            self._icon_preview_cancellable.cancel()
+        self._icon_preview_cancellable = Gio.Cancellable()
+        load_icon_pixbuf_async(self._icon_entry.get_text(), 16,
+                               self._on_icon_preview_loaded,
+                               self._icon_preview_cancellable)
+        return False
 
-        entry.set_property("primary-icon-pixbuf", get_icon_pixbuf(icon, 16))
+    def _on_icon_preview_loaded(self, pixbuf):
+        self._icon_entry.set_property("primary-icon-pixbuf", pixbuf)
 
     def on_icon_entry_icon_press(self, entry, icon_pos, event, data=None):
         """
@@ -595,6 +1138,89 @@ class Application(object):
     def on_terminal_button_toggled(self, button, data=None):
         self._ui_value_changed("Terminal", str(button.get_active()).lower())
 
+    def on_tools_batch_edit_activate(self, action, data=None):
+        """
+        Apply batch edit operations to the selected launchers.
+        """
+        # imported here, batch editing loads pyxdg which is kept off the
+        # startup path
+        from dee.batchdialog import BatchEditDialog
+        filenames = self._get_selected_launchers()
+        dialog = BatchEditDialog(self.window, self.UI_DIR, filenames,
+                                 self._on_batch_edit_done)
+        dialog.show()
+
+    def _on_batch_edit_done(self, filenames):
+        self._on_launchers_changed(filenames)
+        self._launch_status("Changed %d files" % len(filenames))
+        # the open entry must not overwrite the batch edits of its file when
+        # it is next saved
+        entry = self._entry
+        if entry and entry.filename in filenames:
+            self._flush_pending_values()
+            if entry.isModified():
+                self.error_dialog("%s was changed by the batch edit but also "
+                                  "has unsaved changes. Saving it will undo "
+                                  "the batch edit of this file."
+                                  % entry.filename)
+            else:
+                self.open_file(entry.filename)
+
+    def on_tools_audit_activate(self, action, data=None):
+        """
+        Check the programs and icons of every launcher in a worker thread.
+        """
+        if self._desktop_index:
+            filenames = self._desktop_index.get_effective_files()
+        else:
+            filenames = list(self._launchers)
+        theme_name = get_theme_index().theme_name
+        self._audit_actions.set_sensitive(False)
+        self._launch_status("Auditing %d launchers..." % len(filenames))
+
+        def run():
+            from dee.audit import Auditor
+            # a separate index, the one of dee.icons is used by the main thread
+            auditor = Auditor(icon_index=IconThemeIndex(theme_name))
+            results = list(auditor.audit_files(filenames))
+            GLib.idle_add(self._on_audit_done, results)
+        thread = threading.Thread(target=run, name="Audit")
+        thread.daemon = True
+        thread.start()
+
+    def _on_audit_done(self, results):
+        """
+        Flag the launchers with problems and show the audit report.
+        """
+        self._audit_actions.set_sensitive(True)
+        self._audit_problems = dict((result["file"], result["problems"])
+                                    for result in results if result["problems"])
+        self._treeview.queue_draw()
+        self._launch_status("%d of %d launchers have problems"
+                            % (len(self._audit_problems), len(results)))
+        self._audit_report_dialog(self._audit_problems)
+        return False
+
+    def _audit_report_dialog(self, problems):
+        dialog = Gtk.Dialog("Audit", self.window, Gtk.DialogFlags.DESTROY_WITH_PARENT,
+                            (Gtk.STOCK_CLOSE, Gtk.ResponseType.CLOSE))
+        dialog.set_default_size(600, 400)
+        textview = Gtk.TextView()
+        textview.set_editable(False)
+        lines = []
+        for filename in sorted(problems):
+            lines.append(filename)
+            lines.extend("    %s" % problem for problem in problems[filename])
+        if not lines:
+            lines.append("No problems found.")
+        textview.get_buffer().set_text("\n".join(lines))
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_shadow_type(Gtk.ShadowType.IN)
+        scrolled.add(textview)
+        dialog.get_content_area().pack_start(scrolled, True, True, 0)
+        dialog.connect("response", lambda dialog, response: dialog.destroy())
+        dialog.show_all()
+
     def on_tools_validate_activate(self, action, data=None):
         """
         Run the validate() method on the entry and show the results in a Gtk
@@ -608,11 +1234,70 @@ class Application(object):
         self.info_dialog("%s is valid." % os.path.basename(self._entry.filename),
                          "Validation")
 
+    def on_treeview_query_tooltip(self, treeview, x, y, keyboard_mode, tooltip):
+        """
+        Show the generic name of the launcher and any problems found by the
+        audit. Built on demand instead of being stored for every row.
+        """
+        (hit, x, y, model, path, iter) = treeview.get_tooltip_context(x, y,
+                                                                    keyboard_mode)
+        if not hit:
+            return False
+        filename = model.get_value(iter, 2)
+        record = self._launchers.get(filename)
+        if record is None:
+            return False
+        text = GLib.markup_escape_text(record.generic_name or
+                                       model.get_value(iter, 1))
+        problems = self._audit_problems.get(filename)
+        if problems:
+            text += "\n\n" + "\n".join(GLib.markup_escape_text(problem)
+                                       for problem in problems)
+        tooltip.set_markup(text)
+        treeview.set_tooltip_row(tooltip, path)
+        return True
+
     def on_treeview_button_press_event(self, treeview, event, data=None):
         # if user needs to save...
             # return True
+        if event.type == Gdk.EventType.BUTTON_PRESS and event.button == 3:
+            result = treeview.get_path_at_pos(int(event.x), int(event.y))
+            if result:
+                model = treeview.get_model()
+                filename = model.get_value(model.get_iter(result[0]), 2)
+                if filename is not None:
+                    self._popup_launcher_menu(filename, event)
+                    return True
         return False
 
+    def _popup_launcher_menu(self, filename, event):
+        """
+        Show a context menu for a launcher listing the files it overrides, so
+        that the shadowed system launchers can be opened.
+        """
+        menu = Gtk.Menu()
+        shadowed = []
+        if self._desktop_index:
+            desktop_id = self._desktop_index.get_id(filename)
+            shadowed = self._desktop_index.get_shadowed(desktop_id)
+        if shadowed:
+            item = Gtk.MenuItem("Overrides:")
+            item.set_sensitive(False)
+            menu.append(item)
+            for path in shadowed:
+                item = Gtk.MenuItem(path)
+                item.connect("activate", lambda item, path: self.open_file(path),
+                             path)
+                menu.append(item)
+        else:
+            item = Gtk.MenuItem("Does not override other files")
+            item.set_sensitive(False)
+            menu.append(item)
+        menu.show_all()
+        # keep a reference until the menu is closed
+        self._launcher_menu = menu
+        menu.popup(None, None, None, None, event.button, event.time)
+
     def on_main_window_map_event(self, window, event, data=None):
         #while Gtk.events_pending():
         #    Gtk.main_iteration()
@@ -621,40 +1306,76 @@ class Application(object):
     def on_main_window_show(self, window, data=None):
         self._ensure_user_dir()
         self._load_treeview()
-        pass
+        self._monitor.start()
 
     def on_name_entry_changed(self, entry, data=None):
-        self._ui_value_changed("Name", entry.get_text())
+        self._queue_value_changed("Name", entry.get_text())
+
+    def on_search_entry_changed(self, entry, data=None):
+        self._apply_search()
 
-    def on_notebook_switch_page(self, notebook, page, data=None):
-        index = self._notebook.get_current_page()
-        if index == self.SOURCE_TAB:
+    def on_notebook_switch_page(self, notebook, page, page_num, data=None):
+        if self._entry:
+            self._flush_pending_values()
+        if page_num == self.SOURCE_TAB:
+            if not self._sourceview:
+                self._init_source_tab(self._builder)
             self._update_source_tab()
-        elif index == self.ADVANCED_TAB:
+        elif page_num == self.ADVANCED_TAB:
+            if not self._advanced_treeview:
+                self._init_advanced_tab(self._builder)
             self._update_advanced_tab()
         else:
             self._update_basic_tab()
 
+    def _on_first_draw(self, window, cr):
+        """
+        Record the time of the first paint of the main window.
+        """
+        window.disconnect_by_func(self._on_first_draw)
+        timing.mark("first-paint")
+        return False
+
     def on_treeview_selection_changed(self, selection, data=None):
         """
         Change the currently selected desktop entry.
         """
-        model, iter = selection.get_selected()
-        if model and iter:
-            self.open_file(model.get_value(iter, 2))
+        filenames = self._get_selected_launchers()
+        # several rows are selected to batch edit them
+        self._batch_actions.set_sensitive(len(filenames) > 1)
+        if len(filenames) == 1:
+            self.open_file(filenames[0])
+
+    def _get_selected_launchers(self):
+        """
+        Return the files of the selected launchers. Group rows are skipped and
+        a launcher shown in several groups is only returned once.
+        """
+        model, paths = self._treeview.get_selection().get_selected_rows()
+        filenames = []
+        for path in paths:
+            filename = model.get_value(model.get_iter(path), 2)
+            if filename is not None and filename not in filenames:
+                filenames.append(filename)
+        return filenames
 
     def on_url_entry_changed(self, entry, data=None):
-        self._ui_value_changed("URL", entry.get_text())
+        self._queue_value_changed("URL", entry.get_text())
 
     def on_url_entry_icon_press(self, entry, icon_pos, event, data=None):
         if not self._entry:
             return
-        subprocess.call(["xdg-open", self._entry.getURL()])
+        self._flush_pending_values()
+        self._start_launch_test(["xdg-open", self._entry.getURL()])
 
     def on_view_read_only_toggled(self, action, data=None):
         self._settings.set_boolean("show-read-only-files",
                                     action.get_active())
 
+    def on_view_launchers_changed(self, action, current, data=None):
+        self._settings.set_string("launcher-view",
+                                  self.LAUNCHER_VIEWS[current.get_current_value()])
+
     def on_view_refresh_activate(self, action, data=None):
         self._load_treeview()
 
@@ -692,6 +1413,7 @@ class Application(object):
         Open the specified desktop file.
         """
         # TODO make sure this desktop file is selected in the list
+        from dee.entry import Entry
         try:
             self._entry = Entry(desktop_file)
         except ParsingError as e:
@@ -713,6 +1435,11 @@ class Application(object):
         Used as callback for both user quit (File > Quit) and window manager
         killing the window.
         """
+        if self._scanner:
+            self._scanner.cancel()
+        self._monitor.stop()
+        # do not lose a save which is still being written
+        self._saver.wait()
         Gtk.main_quit()
 
     def run(self):
@@ -750,12 +1477,38 @@ class Application(object):
                 filename = None
         return filename
 
+    @trace.traced("save_file")
     def save_file(self, filename):
+        """
+        Save the current entry to filename. The file is written by the
+        FileSaver in the background and _on_file_saved() is called when done.
+        """
         # TODO confirm user wants to save if the file is invalid
-        self._entry.write(filename)
-        self._load_treeview()
+        self._flush_pending_values()
+        entry = self._entry
+        entry.filename = filename
+        self._saver.save(filename, entry.serialize(), self._on_file_saved)
         self.set_modified(False)
-        self._load_desktop_entry_ui()
+        self._status_pop()
+        self._status_push("Saving %s..." % filename)
+
+    def _on_file_saved(self, filename, error):
+        """
+        Called by the FileSaver once filename has been written or has failed.
+        """
+        entry = self._entry
+        is_current = entry is not None and entry.filename == filename
+        if error:
+            if is_current:
+                self.set_modified(True)
+            self.error_dialog("Could not save %s: %s" % (filename, error))
+        else:
+            self._on_launchers_changed((filename,))
+        if is_current:
+            # the file may not have existed before, which made it read-only
+            self._update_ui()
+            self._status_pop()
+            self._status_push(filename)
 
     def set_modified(self, modified=True):
         """
@@ -789,20 +1542,87 @@ class Application(object):
             self._entry.removeKey(key)
         else:
             self._entry.set(key, value)
+        self._queue_source_update()
+
+    def _queue_value_changed(self, key, value):
+        """
+        Handle a value typed into one of the entries of the Basic tab. The
+        Entry is updated once the user pauses typing, only the modified flag
+        is set right away.
+        """
+        if self._state != self.STATE_NORMAL:
+            return # do not continue if we're loading UI
+        if not self._entry.isModified():
+            self.set_modified(True)
+        self._pending_values[key] = value
+        if self._pending_values_id:
+            GLib.source_remove(self._pending_values_id)
+        self._pending_values_id = GLib.timeout_add(self.TYPING_DELAY,
+                                                   self._on_pending_values_timeout)
+
+    def _on_pending_values_timeout(self):
+        self._pending_values_id = None
+        self._flush_pending_values()
+        return False
+
+    def _discard_pending_values(self):
+        if self._pending_values_id:
+            GLib.source_remove(self._pending_values_id)
+            self._pending_values_id = None
+        self._pending_values = {}
+
+    def _flush_pending_values(self):
+        """
+        Apply the values queued by _queue_value_changed() to the Entry.
+        """
+        values = self._pending_values
+        self._discard_pending_values()
+        for key, value in values.items():
+            self._ui_value_changed(key, value)
 
     def _update_advanced_tab(self):
         """
         Update the advanced tab based on the current state of the Entry.
         """
+        if not self._entry:
+            return
+        entry = self._entry
+        values = entry.content.get(entry.defaultGroup, {})
         model = self._advanced_treeview.get_model()
-        model.clear()
-        for key, tooltip, t in self.ALL_KEYS:
-            try:
-                value = str(self._entry.get(key))
-            except:
-                value = None
-            tooltip = GLib.markup_escape_text(tooltip)
-            model.append((key, value, tooltip,))
+        rows = self._advanced_rows
+
+        # the keys of the specification are always listed, plus every other
+        # key in the file such as translations and X- extensions
+        for key in [key for key in rows if key not in values
+                    and key not in self._key_tooltips]:
+            model.remove(rows.pop(key))
+        new_keys = [key for key in values if key not in rows]
+        if len(new_keys) > 50:
+            # appending to a displayed, sorted model is slow for entries with
+            # many translations
+            self._advanced_treeview.set_model(None)
+        for key in new_keys:
+            rows[key] = model.append((key, values[key],
+                                      self._get_key_tooltip(key),))
+        for key, iter in rows.items():
+            value = values.get(key, "")
+            if model.get_value(iter, 1) != value:
+                model.set_value(iter, 1, value)
+        if self._advanced_treeview.get_model() is None:
+            self._advanced_treeview.set_model(model)
+
+    def _get_key_tooltip(self, key):
+        """
+        Return the escaped tooltip for a key which is not in ALL_KEYS.
+        """
+        (base_key, sep, locale) = key.partition("[")
+        if sep and base_key in self._key_tooltips:
+            return "%s\n\n<i>Translation for %s</i>" % (
+                        self._key_tooltips[base_key],
+                        GLib.markup_escape_text(locale.rstrip("]")))
+        if key.startswith("X-"):
+            return "Extension key, not defined by the specification."
+        return None
 
     def _update_basic_tab(self):
         """
@@ -830,31 +1650,55 @@ class Application(object):
         self._url_entry.set_text(entry.getURL())
 
 
+    def _get_source_line_iter(self, line):
+        """
+        Return a GtkTextIter at the start of line in the source view's buffer,
+        or at the end of the buffer if there is no such line.
+        """
+        buffer = self._sourceview.get_buffer()
+        if line >= buffer.get_line_count():
+            return buffer.get_end_iter()
+        return buffer.get_iter_at_line(line)
+
+    def _queue_source_update(self):
+        """
+        Update the source tab shortly, once the user pauses typing.
+        """
+        if not self._source_update_id:
+            self._source_update_id = GLib.timeout_add(self.TYPING_DELAY,
+                                                      self._on_source_update_timeout)
+
+    def _on_source_update_timeout(self):
+        self._source_update_id = None
+        if self._entry:
+            self._update_source_tab()
+        return False
+
+    @trace.traced("update_source_tab")
     def _update_source_tab(self):
         """
         Update the source tab with the contents of what the .desktop file would
         look like based on the current, possibly unsaved entry.
-        """
-        # temporarily change entry filename to a temp file to write it's output
-        entry = self._entry
-        original_filename = self._entry.filename
-        (fd, filename) = tempfile.mkstemp(suffix=".desktop")
-        entry.write(filename)
 
-        # load temp file into sourceview
-        #self._sourceview.set_editable(False)
+        Only the lines which differ from the buffer are replaced, so that the
+        highlighting, scroll position and undo history of the rest are kept.
+        """
+        if not self._sourceview:
+            return # rendered when the tab is first shown
         buffer = self._sourceview.get_buffer()
-        with open(entry.filename, 'r') as f:
-            buffer.set_text(f.read())
-        f.closed
-        #self._sourceview.set_editable(True)
-
-        # clean up
-        if fd:
-            os.close(fd)
-        if filename:
-            os.remove(filename)
-        entry.filename = original_filename
+        old_text = buffer.get_text(buffer.get_start_iter(),
+                                   buffer.get_end_iter(), True)
+        new_text = self._entry.serialize()
+        if old_text == new_text:
+            return
+        changes = line_changes(split_lines(old_text), split_lines(new_text))
+        buffer.begin_user_action()
+        for start, end, lines in changes:
+            start_iter = self._get_source_line_iter(start)
+            end_iter = self._get_source_line_iter(end)
+            buffer.delete(start_iter, end_iter)
+            buffer.insert(start_iter, "".join(lines))
+        buffer.end_user_action()
 
     def _update_ui(self):
         """
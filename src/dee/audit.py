@@ -0,0 +1,108 @@
+import os
+import time
+
+from dee.execline import get_exec_binary
+from dee.icontheme import IconThemeIndex
+from dee.parser import DesktopFile
+from xdg.Exceptions import ParsingError
+
+class PathIndex(object):
+    """
+    Index of the programs in the directories of $PATH.
+
+    Each directory is listed once when the index is built. Whether a program
+    is executable is only checked when it is first looked up, and every
+    lookup is remembered.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.environ.get("PATH", os.defpath)
+        self._programs = {}     # name -> [full paths in $PATH order]
+        self._found = {}
+        for directory in path.split(os.pathsep):
+            try:
+                names = os.listdir(directory or os.curdir)
+            except OSError:
+                continue
+            for name in names:
+                self._programs.setdefault(name, []).append(
+                                                os.path.join(directory, name))
+
+    def find(self, program):
+        """
+        Return the full path of the executable program, a name to search for
+        in $PATH or a path, or None if it cannot be found.
+        """
+        if program in self._found:
+            return self._found[program]
+        if os.sep in program:
+            candidates = [program]
+        else:
+            candidates = self._programs.get(program, [])
+        found = None
+        for candidate in candidates:
+            if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+                found = candidate
+                break
+        self._found[program] = found
+        return found
+
+class Auditor(object):
+    """
+    Check that the programs and icons desktop entries refer to are installed.
+
+    Each distinct program and icon is resolved only once, so auditing
+    thousands of entries costs little more than parsing them.
+    """
+
+    def __init__(self, path_index=None, icon_index=None):
+        if path_index is None:
+            path_index = PathIndex()
+        if icon_index is None:
+            icon_index = IconThemeIndex()
+        self._path_index = path_index
+        self._icon_index = icon_index
+        self._icons = {}
+
+    def has_icon(self, icon):
+        if icon not in self._icons:
+            if os.path.isabs(icon):
+                self._icons[icon] = os.path.isfile(icon)
+            else:
+                self._icons[icon] = self._icon_index.has_icon(icon)
+        return self._icons[icon]
+
+    def audit_file(self, filename):
+        """
+        Audit a single desktop entry file and return a dict with the file
+        name, the list of problems found and the time taken in seconds.
+        """
+        start = time.time()
+        problems = []
+        try:
+            entry = DesktopFile(filename)
+            if entry.getType() == "Application":
+                try_exec = entry.getTryExec()
+                if try_exec and not self._path_index.find(try_exec):
+                    problems.append("TryExec program not found: %s" % try_exec)
+                program = get_exec_binary(entry.getExec())
+                if program and not self._path_index.find(program):
+                    problems.append("Exec program not found: %s" % program)
+            icon = entry.getIcon()
+            if icon and not self.has_icon(icon):
+                problems.append("Icon not found: %s" % icon)
+        except (ParsingError, IOError, OSError) as e:
+            problems.append(str(e))
+        return {
+            "file": filename,
+            "problems": problems,
+            "time": round(time.time() - start, 6),
+        }
+
+    def audit_files(self, filenames):
+        """
+        Audit each of filenames, yielding the results in order.
+        """
+        for filename in filenames:
+            yield self.audit_file(filename)
@@ -0,0 +1,195 @@
+import os
+import re
+import difflib
+import logging
+import functools
+import multiprocessing
+
+from dee.fileutil import fsync_dir, write_temp
+from dee.parser import DesktopFile
+from dee.textdiff import split_lines
+from dee.workers import create_pool, get_chunksize
+from xdg.Exceptions import ParsingError
+
+logger = logging.getLogger(__name__)
+
+# Operations are tuples so that they can be sent to worker processes:
+#   (SET, key, value)
+#   (REMOVE, key)
+#   (REPLACE, key, pattern, replacement)
+SET = "set"
+REMOVE = "remove"
+REPLACE = "replace"
+
+def _check_value(key, value):
+    # a line break would end the line, leaving the rest as an invalid line
+    if "\n" in value or "\r" in value:
+        raise ValueError("Value of %s contains a line break: %r" % (key, value))
+
+def check_operations(operations):
+    """
+    Raise ValueError if any of operations is not valid.
+    """
+    if not operations:
+        raise ValueError("No operations given")
+    for operation in operations:
+        if not operation or operation[0] not in (SET, REMOVE, REPLACE):
+            raise ValueError("Unknown operation: %r" % (operation,))
+        if not operation[1] or "=" in operation[1]:
+            raise ValueError("Invalid key: %r" % operation[1])
+        if operation[0] == SET:
+            _check_value(operation[1], operation[2])
+        if operation[0] == REPLACE:
+            try:
+                pattern = re.compile(operation[2])
+            except re.error as e:
+                raise ValueError("Invalid pattern %r: %s" % (operation[2], e))
+            # the template is parsed by sub(), even when nothing matches
+            try:
+                pattern.sub(operation[3], "")
+            except (re.error, IndexError) as e:
+                raise ValueError("Invalid replacement %r: %s"
+                                 % (operation[3], e))
+
+def apply_operations(desktop_file, operations):
+    """
+    Apply operations to the default group of a DesktopFile. Keys which are not
+    set are not touched by REMOVE and REPLACE. Raises ValueError if a value
+    would contain a line break.
+    """
+    for operation in operations:
+        kind, key = operation[0], operation[1]
+        if kind == SET:
+            desktop_file.set(key, operation[2])
+        elif kind == REMOVE:
+            desktop_file.removeKey(key)
+        elif kind == REPLACE and desktop_file.hasKey(key):
+            value = desktop_file.get(key)
+            new_value = re.sub(operation[2], operation[3], value)
+            if new_value != value:
+                _check_value(key, new_value)
+                desktop_file.set(key, new_value)
+
+def edit_file(filename, operations, stage=False):
+    """
+    Apply operations to a desktop entry file without changing it and return a
+    dict with the file name, whether it changed, a unified diff of the change
+    and any error. With stage=True the new contents are also written to a
+    temporary file, named in "staged", for commit() to move into place.
+    """
+    result = {"file": filename, "changed": False, "diff": "", "staged": None,
+              "error": None}
+    try:
+        desktop_file = DesktopFile(filename)
+        old_text = desktop_file.serialize()
+        apply_operations(desktop_file, operations)
+        new_text = desktop_file.serialize()
+        if new_text == old_text:
+            return result
+        if not os.access(filename, os.W_OK):
+            raise OSError("Permission denied: %s" % filename)
+        result["changed"] = True
+        result["diff"] = "".join(difflib.unified_diff(
+                                    split_lines(old_text),
+                                    split_lines(new_text),
+                                    filename, filename))
+        if stage:
+            result["staged"] = write_temp(filename, new_text)
+    except (ParsingError, IOError, OSError, ValueError) as e:
+        result["error"] = str(e)
+    return result
+
+def edit_files(filenames, operations, jobs=None, stage=False):
+    """
+    Run edit_file() on each of filenames across a pool of jobs worker
+    processes and return the list of results, in no particular order.
+    """
+    check_operations(operations)
+    func = functools.partial(edit_file, operations=operations, stage=stage)
+    if not jobs:
+        jobs = multiprocessing.cpu_count()
+    if jobs == 1 or len(filenames) < 2:
+        return [func(filename) for filename in filenames]
+    pool = create_pool(jobs)
+    try:
+        results = list(pool.imap_unordered(func, filenames,
+                                           get_chunksize(len(filenames), jobs)))
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+    return results
+
+def discard(results):
+    """
+    Remove the temporary files staged by edit_files().
+    """
+    for result in results:
+        if result["staged"]:
+            try:
+                os.unlink(result["staged"])
+            except OSError as e:
+                logger.warn("Could not remove %s: %s" % (result["staged"], e))
+            result["staged"] = None
+
+def verify(results):
+    """
+    Parse each of the staged files of results again, setting the error of
+    the results whose files no longer parse. Returns True if all of them do.
+    """
+    valid = True
+    for result in results:
+        if result["staged"]:
+            try:
+                DesktopFile(result["staged"])
+            except ParsingError as e:
+                result["error"] = "%s: %s" % (result["file"], e)
+                valid = False
+    return valid
+
+def commit(results):
+    """
+    Move the staged files of results into place, all or nothing. Nothing is
+    written if any of the results has an error, or if any staged file does
+    not parse, in which case ValueError is raised. If moving a file fails, the
+    files already replaced are restored from hard links to the originals and
+    the OSError is raised. Returns the number of files changed.
+    """
+    if any(result["error"] for result in results):
+        discard(results)
+        return 0
+    if not verify(results):
+        discard(results)
+        raise ValueError("; ".join(result["error"] for result in results
+                                   if result["error"]))
+    staged = [result for result in results if result["staged"]]
+    backups = []
+    try:
+        # hard links keep the original contents around for a rollback and
+        # cost no copying
+        # a symlink is kept and the file it points to is replaced, that is
+        # where write_temp() staged the new contents
+        targets = [os.path.realpath(result["file"]) for result in staged]
+        for result, target in zip(staged, targets):
+            backup = result["staged"] + ".orig"
+            os.link(target, backup)
+            backups.append((target, backup))
+        replaced = set()
+        try:
+            for result, target in zip(staged, targets):
+                os.rename(result["staged"], target)
+                result["staged"] = None
+                replaced.add(target)
+        except OSError:
+            for filename, backup in backups:
+                if filename in replaced:
+                    os.rename(backup, filename)
+            raise
+        for dirname in set(os.path.dirname(f) for f in replaced):
+            fsync_dir(dirname)
+    finally:
+        discard(results)
+        for filename, backup in backups:
+            if os.path.exists(backup):
+                os.unlink(backup)
+    return len(staged)
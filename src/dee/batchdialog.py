@@ -0,0 +1,232 @@
+import os
+import logging
+import threading
+
+from gi.repository import GLib, Gtk
+
+from dee import batch
+
+logger = logging.getLogger(__name__)
+
+class BatchEditDialog(object):
+    """
+    Dialog to apply a list of batch edit operations to several desktop entry
+    files at once, with a preview of the changes.
+
+    The files are edited by dee.batch in a worker thread so that the dialog
+    stays responsive, and are only written if every one of them can be.
+    """
+    def __init__(self, parent, ui_dir, filenames, done_callback=None):
+        """
+        done_callback is called with the list of files changed once the
+        operations have been applied.
+        """
+        self._filenames = filenames
+        self._done_callback = done_callback
+        self._busy = False
+
+        builder = Gtk.Builder()
+        builder.add_from_file(os.path.join(ui_dir, "batch_edit_dialog.ui"))
+        self._dialog = builder.get_object("batch_edit_dialog")
+        self._dialog.set_transient_for(parent)
+        self._operation_combo = builder.get_object("operation_combo")
+        self._key_entry = builder.get_object("key_entry")
+        self._value_entry = builder.get_object("value_entry")
+        self._replacement_entry = builder.get_object("replacement_entry")
+        self._operations_store = builder.get_object("operations_store")
+        self._operations_treeview = builder.get_object("operations_treeview")
+        self._preview_buffer = builder.get_object("preview_textview").get_buffer()
+        self._buttons = [builder.get_object(name) for name in
+                         ("preview_button", "apply_button", "add_button")]
+
+        builder.get_object("files_label").set_text("%d files selected"
+                                                   % len(filenames))
+        column = Gtk.TreeViewColumn("Operation")
+        cell = Gtk.CellRendererText()
+        column.pack_start(cell, True)
+        column.set_cell_data_func(cell, self._operation_data_func)
+        self._operations_treeview.append_column(column)
+
+        self._operation_combo.connect("changed", self.on_operation_combo_changed)
+        builder.get_object("add_button").connect("clicked",
+                                                 self.on_add_button_clicked)
+        builder.get_object("preview_button").connect("clicked",
+                                                     self.on_preview_button_clicked)
+        builder.get_object("apply_button").connect("clicked",
+                                                   self.on_apply_button_clicked)
+        builder.get_object("cancel_button").connect("clicked",
+                                                    lambda button: self.destroy())
+        self._dialog.connect("delete-event", self.on_delete_event)
+
+    def show(self):
+        self._dialog.show()
+
+    def destroy(self):
+        if not self._busy:
+            self._dialog.destroy()
+
+    def _operation_data_func(self, column, cell, model, iter, data=None):
+        (kind, key, value, replacement) = model.get(iter, 0, 1, 2, 3)
+        if kind == batch.SET:
+            text = "Set %s to \"%s\"" % (key, value)
+        elif kind == batch.REMOVE:
+            text = "Remove %s" % key
+        else:
+            text = "Replace /%s/ in %s with \"%s\"" % (value, key, replacement)
+        cell.set_property("text", text)
+
+    def _get_operation(self):
+        """
+        Return the operation described by the entries, or None if there is
+        no key.
+        """
+        kind = self._operation_combo.get_active_id()
+        key = self._key_entry.get_text().strip()
+        if not key:
+            return None
+        if kind == batch.SET:
+            return (batch.SET, key, self._value_entry.get_text())
+        if kind == batch.REMOVE:
+            return (batch.REMOVE, key)
+        return (batch.REPLACE, key, self._value_entry.get_text(),
+                self._replacement_entry.get_text())
+
+    def _get_operations(self):
+        """
+        Return the operations added to the list, or the one being entered if
+        none have been added.
+        """
+        operations = []
+        for row in self._operations_store:
+            (kind, key, value, replacement) = row[:]
+            if kind == batch.SET:
+                operations.append((kind, key, value))
+            elif kind == batch.REMOVE:
+                operations.append((kind, key))
+            else:
+                operations.append((kind, key, value, replacement))
+        if not operations:
+            operation = self._get_operation()
+            if operation:
+                operations.append(operation)
+        return operations
+
+    def _set_busy(self, busy):
+        self._busy = busy
+        for button in self._buttons:
+            button.set_sensitive(not busy)
+
+    def _error_dialog(self, message):
+        dialog = Gtk.MessageDialog(self._dialog, Gtk.DialogFlags.MODAL,
+                                   Gtk.MessageType.ERROR, Gtk.ButtonsType.OK,
+                                   message)
+        dialog.set_title("Error")
+        dialog.run()
+        dialog.destroy()
+
+    def _run(self, work, callback):
+        """
+        Call work with the current operations in a worker thread and callback
+        with what it returns in the main thread.
+        """
+        operations = self._get_operations()
+        try:
+            batch.check_operations(operations)
+        except ValueError as e:
+            self._error_dialog(str(e))
+            return
+        self._set_busy(True)
+        self._preview_buffer.set_text("Working...")
+
+        def run():
+            # the dialog cannot be closed while busy, so always report back
+            try:
+                results = work(operations)
+            except Exception as e:
+                logger.exception("Batch edit failed")
+                GLib.idle_add(failed, e)
+            else:
+                GLib.idle_add(finish, results)
+
+        def finish(results):
+            self._set_busy(False)
+            callback(results)
+            return False
+
+        def failed(error):
+            self._set_busy(False)
+            self._preview_buffer.set_text("")
+            self._error_dialog("The batch edit failed: %s" % error)
+            return False
+
+        thread = threading.Thread(target=run, name="BatchEdit")
+        thread.daemon = True
+        thread.start()
+
+    def _show_results(self, results):
+        results = sorted(results, key=lambda result: result["file"])
+        errors = [result for result in results if result["error"]]
+        changed = [result for result in results if result["changed"]]
+        lines = ["%d of %d files will change, %d errors\n\n"
+                 % (len(changed), len(results), len(errors))]
+        lines.extend("ERROR %s\n" % result["error"] for result in errors)
+        lines.extend(result["diff"] for result in changed)
+        self._preview_buffer.set_text("".join(lines))
+        return errors
+
+    def on_add_button_clicked(self, button, data=None):
+        operation = self._get_operation()
+        if operation is None:
+            return
+        row = list(operation) + [""] * (4 - len(operation))
+        self._operations_store.append(row)
+        self._key_entry.set_text("")
+        self._value_entry.set_text("")
+        self._replacement_entry.set_text("")
+        self._key_entry.grab_focus()
+
+    def on_apply_button_clicked(self, button, data=None):
+        def apply(operations):
+            # committing re-parses and moves every file, which would block
+            # the UI for hundreds of files, so it is done in the worker too
+            results = batch.edit_files(self._filenames, operations, stage=True)
+            try:
+                batch.commit(results)
+            except (OSError, ValueError) as e:
+                return (results, e)
+            return (results, None)
+
+        def applied(outcome):
+            (results, error) = outcome
+            errors = self._show_results(results)
+            if error:
+                self._error_dialog("No files were changed: %s" % error)
+                return
+            if errors:
+                self._error_dialog("No files were changed because %d of them "
+                                   "could not be." % len(errors))
+                return
+            changed = [result["file"] for result in results if result["changed"]]
+            logger.debug("Batch edit changed %d files" % len(changed))
+            if self._done_callback:
+                self._done_callback(changed)
+            self.destroy()
+        self._run(apply, applied)
+
+    def on_delete_event(self, dialog, event, data=None):
+        # the dialog cannot be closed while the files are being written
+        return self._busy
+
+    def on_operation_combo_changed(self, combo, data=None):
+        kind = combo.get_active_id()
+        self._value_entry.set_visible(kind != batch.REMOVE)
+        self._replacement_entry.set_visible(kind == batch.REPLACE)
+        if kind == batch.REPLACE:
+            self._value_entry.set_placeholder_text("Pattern")
+        else:
+            self._value_entry.set_placeholder_text("Value")
+
+    def on_preview_button_clicked(self, button, data=None):
+        self._run(lambda operations: batch.edit_files(self._filenames,
+                                                      operations),
+                  self._show_results)
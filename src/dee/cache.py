@@ -0,0 +1,99 @@
+import os
+import json
+import logging
+
+import xdg.Locale
+from dee.fileutil import atomic_write
+from xdg.BaseDirectory import xdg_cache_home
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = os.path.join(xdg_cache_home, "desktop-entry-editor", "entries.json")
+
+class EntryCache(object):
+    """
+    Persistent index of the desktop entry fields used by the launcher list.
+
+    Records are keyed by file path and are only valid while the file's mtime,
+    size, inode and mode are unchanged, so an unchanged file costs a single
+    stat() instead of a full parse. The mode is included because a chmod
+    changes whether the file is read-only without touching its mtime.
+
+    The names are stored translated, so the cache also records the locale
+    languages it was written for and is not used after the locale changes.
+    """
+    VERSION = 2
+
+    def __init__(self, filename=CACHE_FILE):
+        self.filename = filename
+        self._records = {}
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._records)
+
+    def _stat_key(self, st):
+        return [int(st.st_mtime * 1000000), st.st_size, st.st_ino, st.st_mode]
+
+    def get(self, path, st):
+        """
+        Return the cached fields for path if its stat result st still matches
+        the cached one, otherwise None.
+        """
+        record = self._records.get(path)
+        if record and record[0] == self._stat_key(st):
+            return record[1]
+        return None
+
+    def set(self, path, st, fields):
+        """
+        Store the fields for path along with its stat result st.
+        """
+        self._records[path] = [self._stat_key(st), list(fields)]
+        self._dirty = True
+
+    def prune(self, paths):
+        """
+        Remove the records for files which are not in paths.
+        """
+        paths = set(paths)
+        for path in list(self._records):
+            if path not in paths:
+                del self._records[path]
+                self._dirty = True
+
+    def load(self):
+        """
+        Load the cache file. A missing, corrupt or outdated cache file is
+        silently treated as an empty cache.
+        """
+        self._records = {}
+        self._dirty = False
+        try:
+            with open(self.filename, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            logger.debug("Not using entry cache: %s" % e)
+            return
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return
+        if data.get("langs") != list(xdg.Locale.langs):
+            logger.debug("Not using entry cache: the locale has changed")
+            return
+        self._records = data.get("entries", {})
+
+    def save(self):
+        """
+        Write the cache file if it has changed. The file is replaced atomically
+        so that readers never see a partial cache.
+        """
+        if not self._dirty:
+            return
+        try:
+            data = {"version": self.VERSION, "langs": list(xdg.Locale.langs),
+                    "entries": self._records}
+            atomic_write(self.filename, json.dumps(data))
+        except (IOError, OSError) as e:
+            logger.warn("Could not write entry cache: %s" % e)
+            return
+        self._dirty = False
@@ -0,0 +1,104 @@
+import os
+from collections import OrderedDict
+
+# The main categories of the Desktop Menu Specification and the names menus
+# usually give them. Audio and Video always come with AudioVideo.
+MAIN_CATEGORIES = OrderedDict((
+    ("AudioVideo", "Sound & Video"),
+    ("Development", "Programming"),
+    ("Education", "Education"),
+    ("Game", "Games"),
+    ("Graphics", "Graphics"),
+    ("Network", "Internet"),
+    ("Office", "Office"),
+    ("Science", "Science"),
+    ("Settings", "Settings"),
+    ("System", "System Tools"),
+    ("Utility", "Accessories"),
+))
+OTHER_GROUP = "Other"
+
+def get_category_groups(categories):
+    """
+    Return the groups a launcher with categories is shown in when grouped by
+    main category, as a list of paths of group names.
+    """
+    groups = [(name,) for category, name in MAIN_CATEGORIES.items()
+              if category in categories]
+    return groups or [(OTHER_GROUP,)]
+
+class CategoryIndex(object):
+    """
+    Index of the launchers in the list by category.
+
+    The index is filled while the applications directories are scanned from
+    the categories already parsed for the list, and is updated one file at a
+    time when files change, so grouping the launchers in a different way
+    never needs the files to be read again.
+    """
+
+    def __init__(self):
+        self._entries = {}      # filename -> (desktop file ID, categories)
+        self._files = {}        # category -> set of filenames
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, filename):
+        return filename in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self._files.clear()
+
+    def add(self, filename, desktop_id, categories):
+        """
+        Index filename, replacing what was indexed for it before. desktop_id
+        defaults to the name of the file.
+        """
+        self.remove(filename)
+        if not desktop_id:
+            desktop_id = os.path.basename(filename)
+        categories = tuple(category for category in categories if category)
+        self._entries[filename] = (desktop_id, categories)
+        for category in categories:
+            self._files.setdefault(category, set()).add(filename)
+
+    def remove(self, filename):
+        entry = self._entries.pop(filename, None)
+        if entry is None:
+            return
+        for category in entry[1]:
+            files = self._files.get(category)
+            if files is not None:
+                files.discard(filename)
+                if not files:
+                    del self._files[category]
+
+    def get(self, filename):
+        """
+        Return the (desktop file ID, categories) tuple of filename, or None.
+        """
+        return self._entries.get(filename)
+
+    def get_categories(self):
+        """
+        Return the sorted list of the categories of all launchers.
+        """
+        return sorted(self._files)
+
+    def get_files(self, category):
+        """
+        Return the set of the launchers in category.
+        """
+        return set(self._files.get(category, ()))
+
+    def get_uncategorized(self):
+        """
+        Return the set of the launchers without any category.
+        """
+        return set(filename for filename, (desktop_id, categories)
+                   in self._entries.items() if not categories)
@@ -0,0 +1,146 @@
+import sys
+import json
+import argparse
+
+EXIT_OK = 0
+EXIT_INVALID = 1
+EXIT_USAGE = 2
+
+class _OperationAction(argparse.Action):
+    """
+    Collect the batch edit operations in the order they are given.
+    """
+    def __call__(self, parser, namespace, values, option_string=None):
+        from dee import batch
+
+        operations = getattr(namespace, self.dest, None) or []
+        if option_string == "--set":
+            (key, sep, value) = values[0].partition("=")
+            if not sep:
+                parser.error("--set expects KEY=VALUE")
+            operations.append((batch.SET, key, value))
+        elif option_string == "--remove":
+            operations.append((batch.REMOVE, values[0]))
+        else:
+            operations.append((batch.REPLACE,) + tuple(values))
+        setattr(namespace, self.dest, operations)
+
+def _build_parser(prog):
+    parser = argparse.ArgumentParser(prog=prog,
+        description="Edit desktop entries, or check them without the GUI.")
+    # only one of the tools is run
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--validate", nargs="+", metavar="PATH",
+        help="validate the desktop entries in each PATH (files or directories, "
+             "searched recursively) and write one JSON result per line")
+    mode.add_argument("--audit", nargs="+", metavar="PATH",
+        help="check that the programs (TryExec and Exec) and icons of the "
+             "desktop entries in each PATH are installed and write one JSON "
+             "result per line")
+    parser.add_argument("--icon-theme", default="hicolor", metavar="NAME",
+        help="icon theme to look for icons in with --audit (default: hicolor)")
+    mode.add_argument("--edit", nargs="+", metavar="PATH",
+        help="apply the --set, --remove and --replace operations, in the "
+             "order given, to the desktop entries in each PATH. Nothing is "
+             "written unless every file can be changed")
+    parser.add_argument("--set", nargs=1, metavar="KEY=VALUE",
+        action=_OperationAction, dest="operations", help="set KEY to VALUE")
+    parser.add_argument("--remove", nargs=1, metavar="KEY",
+        action=_OperationAction, dest="operations", help="remove KEY")
+    parser.add_argument("--replace", nargs=3,
+        metavar=("KEY", "PATTERN", "REPLACEMENT"), action=_OperationAction,
+        dest="operations",
+        help="replace matches of the regular expression PATTERN in KEY")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+        help="show the changes --edit would make as unified diffs without "
+             "writing anything")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--strict", action="store_true",
+        help="treat warnings as errors for the exit status")
+    return parser
+
+def _run_validate(args, out):
+    from dee.validate import find_entry_files, validate_files
+
+    status = EXIT_OK
+    for result in validate_files(find_entry_files(args.validate), args.jobs):
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        if result["errors"] or (args.strict and result["warnings"]):
+            status = EXIT_INVALID
+    return status
+
+def _run_audit(args, out):
+    from dee.audit import Auditor
+    from dee.icontheme import IconThemeIndex
+    from dee.validate import find_entry_files
+
+    status = EXIT_OK
+    auditor = Auditor(icon_index=IconThemeIndex(args.icon_theme))
+    for result in auditor.audit_files(find_entry_files(args.audit)):
+        out.write(json.dumps(result) + "\n")
+        if result["problems"]:
+            status = EXIT_INVALID
+    out.flush()
+    return status
+
+def _run_edit(args, out):
+    from dee import batch
+    from dee.validate import find_entry_files
+
+    filenames = find_entry_files(args.edit)
+    results = batch.edit_files(filenames, args.operations, args.jobs,
+                               stage=not args.dry_run)
+    failed = False
+    for result in sorted(results, key=lambda result: result["file"]):
+        if result["error"]:
+            failed = True
+        if args.dry_run:
+            out.write(result["diff"])
+        else:
+            out.write(json.dumps({"file": result["file"],
+                                  "changed": result["changed"],
+                                  "error": result["error"]}) + "\n")
+    out.flush()
+    if failed:
+        batch.discard(results)
+        sys.stderr.write("Not writing any files because of errors.\n")
+        return EXIT_INVALID
+    if not args.dry_run:
+        try:
+            batch.commit(results)
+        except (OSError, ValueError) as e:
+            # commit() has put back any file it had already replaced
+            sys.stderr.write("No files were changed: %s\n" % e)
+            return EXIT_INVALID
+    return EXIT_OK
+
+def main(argv, prog="desktop-entry-editor", out=sys.stdout):
+    """
+    Run the command line tools and return the exit status: 0 if all entries
+    passed (or were changed), 1 if any entry failed and 2 for usage errors.
+    """
+    parser = _build_parser(prog)
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as e:
+        return e.code
+    if args.jobs is not None and args.jobs < 1:
+        parser.print_usage(sys.stderr)
+        return EXIT_USAGE
+    if args.validate:
+        return _run_validate(args, out)
+    if args.audit:
+        return _run_audit(args, out)
+    if args.edit:
+        try:
+            from dee.batch import check_operations
+            check_operations(args.operations)
+        except ValueError as e:
+            parser.print_usage(sys.stderr)
+            sys.stderr.write("%s: error: %s\n" % (prog, e))
+            return EXIT_USAGE
+        return _run_edit(args, out)
+    parser.print_usage(sys.stderr)
+    return EXIT_USAGE
@@ -0,0 +1,182 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+def get_desktop_file_id(filename, applications_dir):
+    """
+    Return the desktop file ID of filename, the path of filename relative to
+    applications_dir with each "/" replaced by "-", or None if filename is not
+    a desktop file under applications_dir.
+    """
+    if not filename.endswith(".desktop"):
+        return None
+    relative = os.path.relpath(filename, applications_dir)
+    if relative.startswith(os.pardir + os.sep) or os.path.isabs(relative):
+        return None
+    return relative.replace(os.sep, "-")
+
+def walk_entry_files(directory, extensions=(".desktop",)):
+    """
+    Walk directory and its subdirectories, yielding a (desktop file ID,
+    os.DirEntry) tuple for each file ending with one of extensions as soon
+    as it is found. The ID is the path of the file relative to directory with
+    each "/" replaced by "-", as for get_desktop_file_id(). Files are yielded
+    in name order, each directory's files before those of its subdirectories.
+
+    os.scandir() gets the type of each file along with its name, so telling
+    files from directories costs no stat() calls, and the DirEntry caches the
+    stat() result for callers which need one.
+    """
+    try:
+        st = os.stat(directory)
+    except OSError:
+        return
+    # symbolic links are followed, so directories are only walked once
+    seen = set([(st.st_dev, st.st_ino)])
+    stack = [(directory, "")]
+    while stack:
+        (path, prefix) = stack.pop()
+        try:
+            entries = sorted(os.scandir(path), key=lambda entry: entry.name)
+        except OSError as e:
+            logger.debug("Cannot list %s: %s" % (path, e))
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    st = entry.stat()
+                    if (st.st_dev, st.st_ino) not in seen:
+                        seen.add((st.st_dev, st.st_ino))
+                        subdirs.append((entry.path, prefix + entry.name + "-"))
+                elif entry.name.endswith(extensions) and entry.is_file():
+                    yield (prefix + entry.name, entry)
+            except OSError:
+                continue
+        stack.extend(reversed(subdirs))
+
+class DesktopFileIndex(object):
+    """
+    Index of the desktop files in the applications directories by desktop
+    file ID.
+
+    The same ID can be installed in several directories, for example when a
+    user copies a system launcher to ~/.local/share/applications to change
+    it. The file in the first directory of the XDG data dirs wins and the
+    others are shadowed by it.
+    """
+
+    def __init__(self, paths):
+        """
+        Index the "applications" directory in each of paths, in order of
+        precedence.
+        """
+        self._dirs = [os.path.join(path, "applications") for path in paths]
+        self._files = {}        # desktop file ID -> [(precedence, filename)]
+        self._dir_entries = {}  # filename -> os.DirEntry, until clear_stats()
+
+    def __len__(self):
+        return len(self._files)
+
+    def __contains__(self, desktop_id):
+        return desktop_id in self._files
+
+    def scan(self):
+        """
+        Index the *.desktop files in each of the applications directories and
+        their subdirectories.
+        """
+        # the directories are scanned in order of precedence so each list of
+        # files is built already sorted
+        self._files.clear()
+        self._dir_entries = {}
+        for precedence, applications_dir in enumerate(self._dirs):
+            for desktop_id, entry in walk_entry_files(applications_dir):
+                self._files.setdefault(desktop_id, []).append((precedence,
+                                                               entry.path))
+                self._dir_entries[entry.path] = entry
+
+    def get_stat(self, filename):
+        """
+        Return the stat result of filename. The os.DirEntry found by scan()
+        is used where there is one, as it caches the result and already has
+        it for symlinks, which the walk had to stat. Raises OSError.
+        """
+        entry = self._dir_entries.get(filename)
+        if entry is not None:
+            return entry.stat()
+        return os.stat(filename)
+
+    def clear_stats(self):
+        """
+        Drop the os.DirEntry objects kept by scan() for get_stat().
+        """
+        self._dir_entries = {}
+
+    def _locate(self, filename):
+        """
+        Return the precedence and desktop file ID of filename, or (None, None)
+        if it is not in one of the applications directories.
+        """
+        for precedence, applications_dir in enumerate(self._dirs):
+            desktop_id = get_desktop_file_id(filename, applications_dir)
+            if desktop_id:
+                return (precedence, desktop_id)
+        return (None, None)
+
+    def get_id(self, filename):
+        """
+        Return the desktop file ID of filename, or None if it is not in one
+        of the applications directories.
+        """
+        return self._locate(filename)[1]
+
+    def add(self, filename):
+        """
+        Add filename to the index and return its desktop file ID, or None if
+        it is not in one of the applications directories.
+        """
+        (precedence, desktop_id) = self._locate(filename)
+        if desktop_id is None:
+            return None
+        files = self._files.setdefault(desktop_id, [])
+        if (precedence, filename) not in files:
+            files.append((precedence, filename))
+            files.sort()
+        return desktop_id
+
+    def remove(self, filename):
+        """
+        Remove filename from the index and return its desktop file ID.
+        """
+        desktop_id = self.get_id(filename)
+        files = self._files.get(desktop_id)
+        if files:
+            files[:] = [f for f in files if f[1] != filename]
+            if not files:
+                del self._files[desktop_id]
+        return desktop_id
+
+    def lookup(self, desktop_id):
+        """
+        Return the filename which takes effect for desktop_id, or None.
+        """
+        files = self._files.get(desktop_id)
+        if files:
+            return files[0][1]
+        return None
+
+    def get_shadowed(self, desktop_id):
+        """
+        Return the filenames which are overridden by the one in effect for
+        desktop_id, highest precedence first.
+        """
+        return [filename for precedence, filename
+                in self._files.get(desktop_id, ())[1:]]
+
+    def get_effective_files(self):
+        """
+        Return the list of filenames in effect, one for each desktop file ID.
+        """
+        return [files[0][1] for files in self._files.values()]
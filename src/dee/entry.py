@@ -1,51 +1,98 @@
 import os
-from xdg.DesktopEntry import DesktopEntry
-import gi
-gi.require_version('Gtk', '3.0')
-from gi.repository import GdkPixbuf, Gtk
+import stat
+from collections import OrderedDict
 
-def get_icon_pixbuf(icon, size):
-    if os.path.isfile(icon):
-        try:
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(icon, size, size)
-            # work around failing to scale xpm's (gdk bug #686910)
-            return pixbuf.scale_simple(size, size, GdkPixbuf.InterpType.NEAREST)
-        except:
-            pass
-    icon_theme = Gtk.IconTheme.get_default()
-    if icon_theme.has_icon(icon):
-        try:
-            pixbuf = icon_theme.load_icon(icon, size,
-                                          Gtk.IconLookupFlags.USE_BUILTIN)
-            # force scale, even for wrong-sized images (gdk bug #686852)
-            return pixbuf.scale_simple(size, size, GdkPixbuf.InterpType.NEAREST)
-        except:
-            pass
+from dee.fileutil import atomic_write
+from dee.parser import DEFAULT_GROUPS, DesktopFile
+from xdg.DesktopEntry import DesktopEntry
+from xdg.Exceptions import ParsingError
 
-    default = icon_theme.load_icon("image-missing", size,
-                                      Gtk.IconLookupFlags.USE_BUILTIN)
-    return default
+class Entry(DesktopFile):
+    """
+    The desktop entry being edited.
 
-class Entry(DesktopEntry):
+    Edits change the lines of the file in place, so comments, blank lines,
+    key order and line endings are kept and saving an entry which was not
+    modified writes back exactly the file that was read.
+    """
 
     def __init__(self, filename=None):
-        DesktopEntry.__init__(self, filename)
+        DesktopFile.__init__(self, filename)
         self.is_modified = False
+        self.errors = []
+        self.warnings = []
 
     def isModified(self):
         return self.is_modified
 
-    def isReadOnly(self):
+    @property
+    def content(self):
+        """
+        The values of the entry as a dict of groups, each an ordered dict
+        mapping keys to values, like the content of xdg.DesktopEntry. Changes
+        to it are not applied to the entry.
+        """
+        content = OrderedDict()
+        for group in self.groups():
+            content[group] = OrderedDict((key, self.get(key, group))
+                                         for key in self.keys(group))
+        return content
+
+    def new(self, filename):
+        """
+        Make the entry a new desktop entry with only a Type, Application for
+        a .desktop file and Directory for a .directory file. Raises
+        ParsingError for other extensions.
+        """
+        extension = os.path.splitext(filename)[1]
+        if extension == ".desktop":
+            entry_type = "Application"
+        elif extension == ".directory":
+            entry_type = "Directory"
+        else:
+            raise ParsingError("Unknown extension", filename)
+        self.parse_string("[%s]\nType=%s\n" % (DEFAULT_GROUPS[0], entry_type))
+        self.filename = filename
+
+    def validate(self, report="All"):
+        """
+        Validate the entry with pyxdg, setting errors and warnings. Raises
+        ValidationError if there are any problems.
+        """
+        desktop_entry = DesktopEntry()
+        desktop_entry.content = dict(self.content)
+        desktop_entry.defaultGroup = self.defaultGroup
+        desktop_entry.filename = self.filename
+        try:
+            desktop_entry.validate(report)
+        finally:
+            self.errors = desktop_entry.errors
+            self.warnings = desktop_entry.warnings
+
+    def write(self, filename=None, trusted=False):
         """
-        Return True if the entry's file is read-only for this user.
+        Write the entry to filename, or to the file it was read from. The
+        file is replaced atomically so a crash cannot truncate it.
         """
-        if self.filename and not os.access(self.filename, os.W_OK):
-            return True
-        return False
+        if filename:
+            self.filename = filename
+        if not self.filename:
+            raise ParsingError("File not found", "")
+        text = self.serialize()
+        if trusted and not text.startswith("#!"):
+            text = "#!/usr/bin/env xdg-open\n" + text
+        atomic_write(self.filename, text)
+        if trusted:
+            mode = os.stat(self.filename).st_mode
+            os.chmod(self.filename, mode | stat.S_IXUSR | stat.S_IXGRP |
+                                    stat.S_IXOTH)
 
     def getIconPixbuf(self, size):
         """
         Render the icon to a GdkPixbuf for the icon at the specified sized.
         """
+        # imported here so that Entry can be used without GTK+ by the
+        # command line tools
+        from dee.icons import get_icon_pixbuf
         icon = self.getIcon()
         return get_icon_pixbuf(icon, size)
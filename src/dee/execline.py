@@ -0,0 +1,78 @@
+import os
+import shlex
+
+def split_exec(exec_line):
+    """
+    Split the value of an Exec key into its arguments using the quoting rules
+    of the Desktop Entry Specification. Returns [] if it cannot be parsed.
+    """
+    try:
+        return shlex.split(exec_line)
+    except ValueError:
+        return []
+
+def get_exec_binary(exec_line):
+    """
+    Return the program run by the value of an Exec key, skipping an "env"
+    prefix and its variable assignments, or "" if there is none.
+    """
+    args = split_exec(exec_line)
+    if args and os.path.basename(args[0]) == "env":
+        args = args[1:]
+        while args and ("=" in args[0] or args[0].startswith("-")):
+            args = args[1:]
+    if not args:
+        return ""
+    return args[0]
+
+# field codes which are deprecated and must be removed by implementations
+DEPRECATED_FIELD_CODES = ("%d", "%D", "%n", "%N", "%v", "%m")
+
+def expand_field_codes(exec_line, files=(), urls=(), name="", icon="",
+                       location=""):
+    """
+    Return the argument list for the value of an Exec key with its field codes
+    expanded as described in the Desktop Entry Specification. files and urls
+    are the documents to open, name, icon and location the Name, Icon and
+    path of the desktop entry. Returns [] if exec_line cannot be parsed.
+    """
+    args = []
+    for arg in split_exec(exec_line):
+        # codes which expand to a list of arguments must stand alone
+        if arg == "%F":
+            args.extend(files)
+        elif arg == "%U":
+            args.extend(list(urls) + list(files))
+        elif arg in ("%f", "%u"):
+            # a single document, or no argument at all when there is none
+            documents = list(files) if arg == "%f" else list(urls) + list(files)
+            args.extend(documents[:1])
+        elif arg == "%i":
+            if icon:
+                args.extend(("--icon", icon))
+        elif arg in DEPRECATED_FIELD_CODES:
+            pass
+        else:
+            args.append(_expand_arg(arg, files, urls, name, location))
+    return args
+
+def _expand_arg(arg, files, urls, name, location):
+    if "%" not in arg:
+        return arg
+    codes = {
+        "f": files[0] if files else "",
+        "u": (list(urls) + list(files) or [""])[0],
+        "c": name,
+        "k": location,
+        "%": "%",
+    }
+    result = []
+    i = 0
+    while i < len(arg):
+        if arg[i] == "%" and i + 1 < len(arg):
+            result.append(codes.get(arg[i + 1], ""))
+            i += 2
+        else:
+            result.append(arg[i])
+            i += 1
+    return "".join(result)
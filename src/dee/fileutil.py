@@ -0,0 +1,81 @@
+import os
+import tempfile
+
+def _get_umask():
+    # os.umask() can only be read by setting it
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+_UMASK = _get_umask()
+
+def fsync_dir(dirname):
+    """
+    Flush a directory to disk so that a rename in it survives a crash. Not
+    all platforms and file systems support this, errors are ignored.
+    """
+    try:
+        fd = os.open(dirname or os.curdir, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def write_temp(filename, data):
+    """
+    Write data, bytes or text to be encoded as UTF-8, to a new temporary file
+    in the directory of filename and flush it to disk. If filename is a
+    symlink, the temporary file is made next to the file it points to, see
+    os.path.realpath(). The temporary file gets the mode, and where allowed
+    the owner and group, of filename, or the default mode for new files if it
+    does not exist yet. Returns the name of the temporary file.
+    """
+    filename = os.path.realpath(filename)
+    dirname = os.path.dirname(filename)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    try:
+        st = os.stat(filename)
+    except OSError:
+        st = None
+    mode = st.st_mode & 0o7777 if st else 0o666 & ~_UMASK
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8', 'surrogateescape')
+    (fd, tmp_filename) = tempfile.mkstemp(dir=dirname or None,
+                                          prefix=".%s." % os.path.basename(filename),
+                                          suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if st and (st.st_uid, st.st_gid) != (os.geteuid(), os.getegid()):
+            try:
+                os.chown(tmp_filename, st.st_uid, st.st_gid)
+            except PermissionError:
+                pass    # only root can give files away
+        # after chown(), which clears the setuid and setgid bits
+        os.chmod(tmp_filename, mode)
+    except:
+        os.unlink(tmp_filename)
+        raise
+    return tmp_filename
+
+def atomic_write(filename, data):
+    """
+    Replace the contents of filename with data so that, even after a crash,
+    the file has either its old or its new contents and is never truncated.
+    A symlink is kept and the file it points to is replaced.
+    """
+    filename = os.path.realpath(filename)
+    tmp_filename = write_temp(filename, data)
+    try:
+        os.rename(tmp_filename, filename)
+    except:
+        os.unlink(tmp_filename)
+        raise
+    fsync_dir(os.path.dirname(filename))
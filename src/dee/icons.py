@@ -0,0 +1,263 @@
+import os
+import threading
+from collections import OrderedDict
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import GdkPixbuf, Gio, GLib, Gtk
+
+from dee import trace
+from dee.icontheme import IconThemeIndex
+
+class IconCache(object):
+    """
+    Bounded LRU cache of the pixbufs rendered by get_icon_pixbuf().
+
+    Pixbufs are keyed by (icon, size, scale). The whole cache is cleared when
+    the default icon theme changes, and icons given as a file path are
+    re-rendered when the file's mtime changes.
+    """
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._pixbufs = OrderedDict()
+        self._lock = threading.Lock()
+        self._theme = None
+
+    def __len__(self):
+        return len(self._pixbufs)
+
+    def _watch_theme(self):
+        icon_theme = Gtk.IconTheme.get_default()
+        if icon_theme is not self._theme:
+            self._theme = icon_theme
+            icon_theme.connect("changed",
+                               lambda icon_theme: _on_icon_theme_changed())
+
+    def clear(self):
+        """
+        Remove all pixbufs from the cache.
+        """
+        with self._lock:
+            self._pixbufs.clear()
+
+    def get(self, key, mtime=None):
+        """
+        Return the cached pixbuf for key or None. The pixbuf is only returned
+        if it was stored with the same mtime.
+        """
+        with self._lock:
+            item = self._pixbufs.get(key)
+            if item is None or item[0] != mtime:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # move to the most recently used end
+            del self._pixbufs[key]
+            self._pixbufs[key] = item
+            return item[1]
+
+    def set(self, key, pixbuf, mtime=None):
+        """
+        Store pixbuf for key, evicting the least recently used pixbufs if the
+        cache is full.
+        """
+        with self._lock:
+            self._pixbufs.pop(key, None)
+            self._pixbufs[key] = (mtime, pixbuf)
+            while len(self._pixbufs) > self.max_size:
+                self._pixbufs.popitem(last=False)
+
+    def set_max_size(self, max_size):
+        """
+        Change the maximum number of pixbufs kept in the cache.
+        """
+        with self._lock:
+            self.max_size = max_size
+            while len(self._pixbufs) > self.max_size:
+                self._pixbufs.popitem(last=False)
+
+icon_cache = IconCache()
+_theme_index = None
+
+def _on_icon_theme_changed():
+    global _theme_index
+    _theme_index = None
+    icon_cache.clear()
+
+def get_theme_index():
+    """
+    Return the IconThemeIndex of the current GTK+ icon theme. It is rebuilt
+    after the theme changes.
+    """
+    global _theme_index
+    icon_cache._watch_theme()
+    if _theme_index is None:
+        settings = Gtk.Settings.get_default()
+        name = None
+        if settings:
+            name = settings.get_property("gtk-icon-theme-name")
+        _theme_index = IconThemeIndex(name or "hicolor")
+    return _theme_index
+
+def _get_icon_mtime(icon):
+    """
+    Return the mtime of the icon if it is a file path, otherwise None.
+    """
+    if os.sep not in icon:
+        return None
+    try:
+        return os.stat(icon).st_mtime
+    except OSError:
+        return None
+
+def _load_theme_icon(icon_theme, icon, size, scale):
+    if scale == 1:
+        return icon_theme.load_icon(icon, size, Gtk.IconLookupFlags.USE_BUILTIN)
+    return icon_theme.load_icon_for_scale(icon, size, scale,
+                                          Gtk.IconLookupFlags.USE_BUILTIN)
+
+def _render_file_pixbuf(icon, size, scale):
+    """
+    Render the icon file, returning None if it is not a readable image. Unlike
+    the icon theme this is safe to call from any thread.
+    """
+    if os.path.isfile(icon):
+        try:
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(icon, size * scale,
+                                                            size * scale)
+            # work around failing to scale xpm's (gdk bug #686910)
+            return pixbuf.scale_simple(size * scale, size * scale,
+                                       GdkPixbuf.InterpType.NEAREST)
+        except:
+            pass
+    return None
+
+def _render_theme_pixbuf(icon, size, scale):
+    # the index answers for the files of the icon themes, GtkIconTheme is only
+    # asked for icons it does not know, such as built-in ones
+    filename = get_theme_index().lookup(icon, size, scale)
+    if filename:
+        pixbuf = _render_file_pixbuf(filename, size, scale)
+        if pixbuf is not None:
+            return pixbuf
+    icon_theme = Gtk.IconTheme.get_default()
+    if icon_theme.has_icon(icon):
+        try:
+            pixbuf = _load_theme_icon(icon_theme, icon, size, scale)
+            # force scale, even for wrong-sized images (gdk bug #686852)
+            return pixbuf.scale_simple(size * scale, size * scale,
+                                       GdkPixbuf.InterpType.NEAREST)
+        except:
+            pass
+
+    default = _load_theme_icon(icon_theme, "image-missing", size, scale)
+    return default
+
+def _render_icon_pixbuf(icon, size, scale):
+    with trace.span("icon.render", icon=icon, size=size):
+        pixbuf = _render_file_pixbuf(icon, size, scale)
+        if pixbuf is None:
+            pixbuf = _render_theme_pixbuf(icon, size, scale)
+    return pixbuf
+
+def get_icon_pixbuf(icon, size, scale=1):
+    """
+    Render the icon, either a file path or an icon name from the default icon
+    theme, to a GdkPixbuf at the specified size. Results are cached in
+    icon_cache and must not be modified.
+    """
+    icon_cache._watch_theme()
+    key = (icon, size, scale)
+    mtime = _get_icon_mtime(icon)
+    pixbuf = icon_cache.get(key, mtime)
+    if pixbuf is None:
+        pixbuf = _render_icon_pixbuf(icon, size, scale)
+        icon_cache.set(key, pixbuf, mtime)
+    return pixbuf
+
+def _finish_async(callback, cancellable, pixbuf):
+    if not cancellable.is_cancelled():
+        callback(pixbuf)
+    return False
+
+def _load_file_icon_thread(icon, filename, key, size, scale, callback,
+                           cancellable):
+    """
+    Worker thread for load_icon_pixbuf_async(): stat and decode the file of
+    the icon. Files which are not images fall back to GtkIconTheme in the main
+    thread.
+    """
+    mtime = _get_icon_mtime(icon)
+    pixbuf = icon_cache.get(key, mtime)
+    if pixbuf is None and not cancellable.is_cancelled():
+        with trace.span("icon.render", icon=icon, size=size):
+            pixbuf = _render_file_pixbuf(filename, size, scale)
+        if pixbuf is not None:
+            icon_cache.set(key, pixbuf, mtime)
+    if pixbuf is None:
+        GLib.idle_add(_load_theme_icon_async, icon, key, size, scale, callback,
+                      cancellable)
+    else:
+        GLib.idle_add(_finish_async, callback, cancellable, pixbuf)
+
+def _load_theme_icon_async(icon, key, size, scale, callback, cancellable):
+    """
+    Look up the icon in the default icon theme and decode it asynchronously.
+    The lookup itself is an in-memory search of the theme's cache.
+    """
+    if cancellable.is_cancelled():
+        return False
+    icon_theme = Gtk.IconTheme.get_default()
+    with trace.span("icon.lookup", icon=icon, size=size):
+        info = icon_theme.lookup_icon_for_scale(icon, size, scale,
+                                                Gtk.IconLookupFlags.USE_BUILTIN)
+    if info is None:
+        pixbuf = _render_theme_pixbuf(icon, size, scale)
+        icon_cache.set(key, pixbuf)
+        return _finish_async(callback, cancellable, pixbuf)
+
+    def loaded(info, result, data=None):
+        try:
+            pixbuf = info.load_icon_finish(result)
+        except GLib.GError:
+            if cancellable.is_cancelled():
+                return
+            pixbuf = _render_theme_pixbuf(icon, size, scale)
+        else:
+            # force scale, even for wrong-sized images (gdk bug #686852)
+            pixbuf = pixbuf.scale_simple(size * scale, size * scale,
+                                         GdkPixbuf.InterpType.NEAREST)
+        icon_cache.set(key, pixbuf)
+        _finish_async(callback, cancellable, pixbuf)
+    info.load_icon_async(cancellable, loaded, None)
+    return False
+
+def load_icon_pixbuf_async(icon, size, callback, cancellable=None, scale=1):
+    """
+    Render the icon like get_icon_pixbuf() without blocking the main loop on
+    disk access or image decoding, and call callback with the pixbuf from the
+    main loop. The callback is not called if cancellable is cancelled first,
+    which lets a newer request supersede an older one.
+    """
+    if cancellable is None:
+        cancellable = Gio.Cancellable()
+    icon_cache._watch_theme()
+    key = (icon, size, scale)
+    if os.sep in icon:
+        filename = icon
+    else:
+        pixbuf = icon_cache.get(key)
+        if pixbuf is not None:
+            GLib.idle_add(_finish_async, callback, cancellable, pixbuf)
+            return
+        filename = get_theme_index().lookup(icon, size, scale)
+        if not filename:
+            _load_theme_icon_async(icon, key, size, scale, callback, cancellable)
+            return
+    thread = threading.Thread(target=_load_file_icon_thread,
+                              args=(icon, filename, key, size, scale, callback,
+                                    cancellable),
+                              name="IconLoader")
+    thread.daemon = True
+    thread.start()
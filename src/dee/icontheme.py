@@ -0,0 +1,372 @@
+import os
+import mmap
+import struct
+import logging
+import configparser
+from collections import namedtuple
+
+from xdg.BaseDirectory import xdg_data_dirs
+
+logger = logging.getLogger(__name__)
+
+ICON_EXTENSIONS = (".png", ".svg", ".xpm")
+
+# flags of an image in icon-theme.cache
+_HAS_SUFFIX_XPM = 1
+_HAS_SUFFIX_SVG = 2
+_HAS_SUFFIX_PNG = 4
+_SUFFIX_FLAGS = ((_HAS_SUFFIX_PNG, ".png"), (_HAS_SUFFIX_SVG, ".svg"),
+                 (_HAS_SUFFIX_XPM, ".xpm"))
+
+# a subdirectory of an icon theme as described by its index.theme
+ThemeDirectory = namedtuple("ThemeDirectory", ("name", "size", "min_size",
+                                               "max_size", "threshold", "type",
+                                               "scale"))
+
+def get_icon_dirs():
+    """
+    Return the base directories searched for icon themes, in order.
+    """
+    dirs = [os.path.expanduser("~/.icons")]
+    dirs.extend(os.path.join(path, "icons") for path in xdg_data_dirs)
+    return dirs
+
+def _icon_name_hash(name):
+    # the hash used by gtk-update-icon-cache, over signed chars
+    data = bytearray(name.encode('utf-8'))
+    if not data:
+        return 0
+    h = data[0] - 256 if data[0] > 127 else data[0]
+    for c in data[1:]:
+        if c > 127:
+            c -= 256
+        h = ((h << 5) - h + c) & 0xffffffff
+    return h & 0xffffffff
+
+class IconCacheFile(object):
+    """
+    Reader for the icon-theme.cache files written by gtk-update-icon-cache.
+
+    The file is memory mapped and looked up through its hash table, the same
+    way GTK+ does, so opening a large cache costs almost nothing. All numbers
+    in the file are big-endian.
+    """
+    MAJOR_VERSION = 1
+
+    def __init__(self, filename):
+        """
+        Open the cache file. Raises IOError, OSError or ValueError if it
+        cannot be read or is not a cache file.
+        """
+        with open(filename, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (major, minor, self._hash_offset,
+         directory_list_offset) = self._unpack(">HHII", 0)
+        if major != self.MAJOR_VERSION:
+            raise ValueError("Unsupported icon cache version %d" % major)
+        (count,) = self._unpack(">I", directory_list_offset)
+        self.directories = [
+            self._string(self._unpack(">I", directory_list_offset + 4 + i * 4)[0])
+            for i in range(count)]
+        (self._n_buckets,) = self._unpack(">I", self._hash_offset)
+
+    def _unpack(self, fmt, offset):
+        try:
+            return struct.unpack_from(fmt, self._data, offset)
+        except struct.error:
+            raise ValueError("Corrupt icon cache")
+
+    def _string(self, offset):
+        end = self._data.find(b"\0", offset)
+        if end < 0:
+            raise ValueError("Corrupt icon cache")
+        return self._data[offset:end].decode('utf-8', 'replace')
+
+    def _images(self, image_list_offset):
+        (count,) = self._unpack(">I", image_list_offset)
+        images = []
+        for i in range(count):
+            (directory, flags, data_offset) = self._unpack(">HHI",
+                                                image_list_offset + 4 + i * 8)
+            extensions = tuple(ext for flag, ext in _SUFFIX_FLAGS if flags & flag)
+            if extensions:
+                images.append((self.directories[directory], extensions))
+        return images
+
+    def lookup(self, name):
+        """
+        Return the images of the icon as a list of (directory, extensions)
+        tuples, or [] if the cache has no such icon.
+        """
+        if not self._n_buckets:
+            return []
+        bucket = _icon_name_hash(name) % self._n_buckets
+        (offset,) = self._unpack(">I", self._hash_offset + 4 + bucket * 4)
+        encoded = name.encode('utf-8') + b"\0"
+        while offset != 0xffffffff:
+            (chain_offset, name_offset, image_list_offset) = self._unpack(">III",
+                                                                          offset)
+            if self._data[name_offset:name_offset + len(encoded)] == encoded:
+                return self._images(image_list_offset)
+            offset = chain_offset
+        return []
+
+    def names(self):
+        """
+        Return the names of all icons in the cache.
+        """
+        names = []
+        for bucket in range(self._n_buckets):
+            (offset,) = self._unpack(">I", self._hash_offset + 4 + bucket * 4)
+            while offset != 0xffffffff:
+                (offset, name_offset) = self._unpack(">II", offset)
+                names.append(self._string(name_offset))
+        return names
+
+class _WalkedIcons(object):
+    """
+    Icons found by listing the directories of a theme without a valid cache,
+    with the same interface as IconCacheFile.
+    """
+    def __init__(self, path, directories):
+        self._icons = {}
+        for directory in directories:
+            try:
+                filenames = os.listdir(os.path.join(path, directory))
+            except OSError:
+                continue
+            for filename in filenames:
+                (name, ext) = os.path.splitext(filename)
+                if ext in ICON_EXTENSIONS:
+                    self._icons.setdefault(name, {}).setdefault(directory,
+                                                                []).append(ext)
+
+    def lookup(self, name):
+        images = self._icons.get(name)
+        if not images:
+            return []
+        return [(directory, tuple(ext for ext in ICON_EXTENSIONS if ext in exts))
+                for directory, exts in images.items()]
+
+    def names(self):
+        return list(self._icons)
+
+def _read_index_theme(filename):
+    """
+    Return the list of inherited themes and the dict of ThemeDirectory tuples
+    from an index.theme file.
+    """
+    parser = configparser.RawConfigParser(strict=False)
+    parser.optionxform = str
+    with open(filename, encoding='utf-8', errors='replace') as f:
+        parser.read_file(f)
+    if not parser.has_section("Icon Theme"):
+        raise ValueError("%s has no [Icon Theme] group" % filename)
+
+    def get(section, key, default=None):
+        if parser.has_option(section, key):
+            return parser.get(section, key).strip()
+        return default
+
+    inherits = [name.strip() for name in get("Icon Theme", "Inherits", "").split(",")
+                if name.strip()]
+    names = [name.strip() for name in
+             get("Icon Theme", "Directories", "").split(",") +
+             get("Icon Theme", "ScaledDirectories", "").split(",")
+             if name.strip()]
+    directories = {}
+    for name in names:
+        if not parser.has_section(name):
+            continue
+        try:
+            size = int(get(name, "Size"))
+            directories[name] = ThemeDirectory(name, size,
+                                    int(get(name, "MinSize", size)),
+                                    int(get(name, "MaxSize", size)),
+                                    int(get(name, "Threshold", 2)),
+                                    get(name, "Type", "Threshold"),
+                                    int(get(name, "Scale", 1)))
+        except (TypeError, ValueError):
+            logger.debug("Ignoring directory %s of %s" % (name, filename))
+    return (inherits, directories)
+
+class _Theme(object):
+    """
+    One icon theme, which may be installed in several base directories.
+    """
+    def __init__(self, name, icon_dirs):
+        self.name = name
+        self.inherits = []
+        self.directories = {}
+        self._sources = []   # (path, IconCacheFile or _WalkedIcons)
+        paths = [os.path.join(icon_dir, name) for icon_dir in icon_dirs]
+        paths = [path for path in paths if os.path.isdir(path)]
+        for path in paths:
+            index_theme = os.path.join(path, "index.theme")
+            if os.path.isfile(index_theme):
+                try:
+                    (self.inherits, self.directories) = _read_index_theme(index_theme)
+                except (IOError, OSError, ValueError,
+                        configparser.Error) as e:
+                    logger.warn("Cannot read %s: %s" % (index_theme, e))
+                    continue
+                break
+        for path in paths:
+            self._sources.append((path, self._open_source(path)))
+
+    def _open_source(self, path):
+        cache_file = os.path.join(path, "icon-theme.cache")
+        try:
+            # like GTK+, ignore a cache older than its directory
+            if os.stat(cache_file).st_mtime >= os.stat(path).st_mtime:
+                return IconCacheFile(cache_file)
+            logger.debug("%s is out of date" % cache_file)
+        except (IOError, OSError, ValueError) as e:
+            logger.debug("Not using %s: %s" % (cache_file, e))
+        return _WalkedIcons(path, self.directories)
+
+    def get_images(self, name):
+        """
+        Return the images of the icon as a list of (path, ThemeDirectory,
+        extensions) tuples.
+        """
+        images = []
+        for path, source in self._sources:
+            for directory, extensions in source.lookup(name):
+                info = self.directories.get(directory)
+                if info:
+                    images.append((path, info, extensions))
+        return images
+
+    def names(self):
+        names = set()
+        for path, source in self._sources:
+            names.update(source.names())
+        return names
+
+def _matches_size(info, size, scale):
+    if info.scale != scale:
+        return False
+    if info.type == "Fixed":
+        return info.size == size
+    if info.type == "Scalable":
+        return info.min_size <= size <= info.max_size
+    return info.size - info.threshold <= size <= info.size + info.threshold
+
+def _size_distance(info, size, scale):
+    wanted = size * scale
+    if info.type == "Fixed":
+        return abs(info.size * info.scale - wanted)
+    if info.type == "Scalable":
+        (low, high) = (info.min_size, info.max_size)
+    else:
+        (low, high) = (info.size - info.threshold, info.size + info.threshold)
+    if wanted < low * info.scale:
+        return low * info.scale - wanted
+    if wanted > high * info.scale:
+        return wanted - high * info.scale
+    return 0
+
+class IconThemeIndex(object):
+    """
+    Index of the icons available in an icon theme, the themes it inherits
+    from and the hicolor fallback theme.
+
+    Existence checks and lookups are answered from the themes' icon caches,
+    or for themes without a valid cache, from a single listing of their
+    directories, instead of asking GtkIconTheme for every name and size.
+    Lookups follow the Icon Theme Specification.
+    """
+
+    def __init__(self, theme_name="hicolor", icon_dirs=None,
+                 pixmaps_dir="/usr/share/pixmaps"):
+        if icon_dirs is None:
+            icon_dirs = get_icon_dirs()
+        self.theme_name = theme_name
+        self._themes = []
+        queue = [theme_name]
+        seen = set()
+        while queue:
+            name = queue.pop(0)
+            if name in seen:
+                continue
+            seen.add(name)
+            theme = _Theme(name, icon_dirs)
+            self._themes.append(theme)
+            queue.extend(theme.inherits)
+        if "hicolor" not in seen:
+            self._themes.append(_Theme("hicolor", icon_dirs))
+        self._pixmaps_dir = pixmaps_dir
+        self._pixmaps = None
+        self._lookups = {}
+
+    def _get_pixmap(self, name):
+        if self._pixmaps is None:
+            self._pixmaps = {}
+            try:
+                filenames = os.listdir(self._pixmaps_dir)
+            except OSError:
+                filenames = []
+            for filename in sorted(filenames):
+                (base, ext) = os.path.splitext(filename)
+                if ext in ICON_EXTENSIONS and base not in self._pixmaps:
+                    self._pixmaps[base] = os.path.join(self._pixmaps_dir, filename)
+        return self._pixmaps.get(name)
+
+    def has_icon(self, name):
+        """
+        Return True if the icon is in one of the themes or in the pixmaps
+        directory.
+        """
+        for theme in self._themes:
+            if theme.get_images(name):
+                return True
+        return self._get_pixmap(name) is not None
+
+    def get_sizes(self, name):
+        """
+        Return the sorted list of the nominal sizes the icon is available in.
+        """
+        sizes = set()
+        for theme in self._themes:
+            for path, info, extensions in theme.get_images(name):
+                sizes.add(info.size)
+        return sorted(sizes)
+
+    def lookup(self, name, size, scale=1):
+        """
+        Return the path of the file best fitting the icon at size and scale,
+        or None if there is no such icon.
+        """
+        key = (name, size, scale)
+        if key not in self._lookups:
+            self._lookups[key] = self._lookup(name, size, scale)
+        return self._lookups[key]
+
+    def _lookup(self, name, size, scale):
+        for theme in self._themes:
+            images = theme.get_images(name)
+            if not images:
+                continue
+            best = None
+            best_distance = None
+            for path, info, extensions in images:
+                if _matches_size(info, size, scale):
+                    best = (path, info, extensions)
+                    break
+                distance = _size_distance(info, size, scale)
+                if best is None or distance < best_distance:
+                    best = (path, info, extensions)
+                    best_distance = distance
+            (path, info, extensions) = best
+            return os.path.join(path, info.name, name + extensions[0])
+        return self._get_pixmap(name)
+
+    def names(self):
+        """
+        Return the set of the names of all icons in the themes.
+        """
+        names = set()
+        for theme in self._themes:
+            names.update(theme.names())
+        return names
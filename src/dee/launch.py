@@ -0,0 +1,132 @@
+import os
+import time
+import logging
+
+import gi
+from gi.repository import GLib
+
+logger = logging.getLogger(__name__)
+
+_wnck = None
+
+def _get_wnck():
+    """
+    Return the Wnck module, or None if libwnck is not available. It is only
+    imported when a launch is first tested, loading it at startup is slow.
+    """
+    global _wnck
+    if _wnck is None:
+        try:
+            gi.require_version('Wnck', '3.0')
+            from gi.repository import Wnck
+            _wnck = Wnck
+        except (ImportError, ValueError):
+            _wnck = False
+    return _wnck or None
+
+class LaunchTest(object):
+    """
+    Run a command without blocking the main loop and time how long it takes
+    to map its first window and to exit.
+
+    Windows are only detected when libwnck is available and running on X11.
+    A window belongs to the command if its WM class matches the given
+    StartupWMClass, or if there is none, if it has the command's pid or its
+    WM class matches the name of the program.
+    """
+    WINDOW_TIMEOUT = 30 # seconds
+
+    def __init__(self, argv, exit_callback=None, window_callback=None,
+                 wm_class=None, working_directory=None):
+        """
+        exit_callback is called with the LaunchTest once the command has exited
+        and window_callback once its first window has been mapped.
+        """
+        self.argv = argv
+        self.pid = None
+        self.exit_status = None     # exit code, or -signal if killed
+        self.exit_time = None       # seconds from spawning until exit
+        self.window_time = None     # seconds from spawning until first window
+        self._exit_callback = exit_callback
+        self._window_callback = window_callback
+        self._wm_class = wm_class
+        self._program = os.path.basename(argv[0]) if argv else ""
+        self._working_directory = working_directory
+        self._start = None
+        self._screen = None
+        self._window_handler = None
+        self._window_timeout = None
+
+    def start(self):
+        """
+        Spawn the command. Raises GLib.GError if it cannot be run.
+        """
+        self._watch_windows()
+        self._start = time.time()
+        try:
+            (self.pid, stdin, stdout, stderr) = GLib.spawn_async(
+                self.argv, working_directory=self._working_directory,
+                flags=GLib.SpawnFlags.SEARCH_PATH |
+                      GLib.SpawnFlags.DO_NOT_REAP_CHILD)
+        except GLib.GError:
+            self._stop_watching_windows()
+            raise
+        GLib.child_watch_add(GLib.PRIORITY_DEFAULT, self.pid, self._on_child_exit)
+        logger.debug("Launched %s (pid %d)" % (" ".join(self.argv), self.pid))
+
+    def _on_child_exit(self, pid, status):
+        self.exit_time = time.time() - self._start
+        if os.WIFSIGNALED(status):
+            self.exit_status = -os.WTERMSIG(status)
+        else:
+            self.exit_status = os.WEXITSTATUS(status)
+        GLib.spawn_close_pid(pid)
+        logger.debug("%s exited with status %d after %.3f s"
+                     % (self._program, self.exit_status, self.exit_time))
+        if self._exit_callback:
+            self._exit_callback(self)
+
+    def _watch_windows(self):
+        Wnck = _get_wnck()
+        if Wnck is None:
+            return
+        screen = Wnck.Screen.get_default()
+        if screen is None:
+            return # not running on X11
+        # windows which are already open must not be reported as new
+        screen.force_update()
+        self._screen = screen
+        self._window_handler = screen.connect("window-opened",
+                                              self._on_window_opened)
+        self._window_timeout = GLib.timeout_add_seconds(self.WINDOW_TIMEOUT,
+                                                        self._on_window_timeout)
+
+    def _stop_watching_windows(self):
+        if self._window_handler:
+            self._screen.disconnect(self._window_handler)
+            self._window_handler = None
+        if self._window_timeout:
+            GLib.source_remove(self._window_timeout)
+            self._window_timeout = None
+
+    def _on_window_timeout(self):
+        self._window_timeout = None
+        self._stop_watching_windows()
+        return False
+
+    def _is_own_window(self, window):
+        names = [(window.get_class_group_name() or "").lower(),
+                 (window.get_class_instance_name() or "").lower()]
+        if self._wm_class:
+            return self._wm_class.lower() in names
+        return window.get_pid() == self.pid or self._program.lower() in names
+
+    def _on_window_opened(self, screen, window):
+        if not self._is_own_window(window):
+            return
+        self.window_time = time.time() - self._start
+        self._stop_watching_windows()
+        logger.debug("%s mapped its first window after %.3f s"
+                     % (self._program, self.window_time))
+        if self._window_callback:
+            self._window_callback(self)
@@ -0,0 +1,115 @@
+import sys
+import logging
+import multiprocessing
+from collections import namedtuple
+
+from dee import trace
+from dee.execline import get_exec_binary
+from dee.parser import DesktopFile
+from dee.workers import create_pool, get_chunksize
+from xdg.Exceptions import ParsingError
+
+logger = logging.getLogger(__name__)
+
+# The fields of a desktop entry needed to show and search it in the launcher
+# list. localized_names holds the translations of Name and GenericName.
+LauncherInfo = namedtuple("LauncherInfo", ("filename", "name", "generic_name",
+                                           "icon", "type", "read_only",
+                                           "localized_names", "keywords",
+                                           "categories", "exec_line"))
+
+# Parsing a file takes about 70 us. Starting the pool costs as much as parsing
+# a few hundred files, and chunks of fewer than 32 files spend more than 10% of
+# the time passing them between processes.
+PARALLEL_MIN_FILES = 200
+CHUNK_MIN_FILES = 32
+
+class LauncherRecord(object):
+    """
+    The part of a LauncherInfo the launcher list keeps for each row. The name
+    and file are stored in the list model itself, and markup and tooltips are
+    derived when a row is drawn or hovered.
+    """
+    __slots__ = ("iter", "generic_name", "icon", "read_only")
+
+    def __init__(self, info, iter=None):
+        self.iter = iter
+        self.generic_name = info.generic_name or None
+        # launchers of the same suite often share an icon
+        self.icon = sys.intern(info.icon) if info.icon else ""
+        self.read_only = info.read_only
+
+def get_launcher_info(desktop_file):
+    """
+    Parse desktop_file and return a LauncherInfo for it. Raises ParsingError
+    if the file cannot be parsed.
+    """
+    entry = DesktopFile(desktop_file)
+    localized_names = [entry.get(key) for key in entry.keys()
+                       if key.startswith(("Name[", "GenericName["))]
+    return LauncherInfo(desktop_file, entry.getName(), entry.getGenericName(),
+                        entry.getIcon(), entry.getType(), entry.isReadOnly(),
+                        localized_names, entry.getKeywords(),
+                        entry.getCategories(), entry.getExec())
+
+def get_search_texts(info):
+    """
+    Return the texts a LauncherInfo should be found by in a search.
+    """
+    texts = [info.name, info.generic_name, get_exec_binary(info.exec_line)]
+    texts.extend(info.localized_names)
+    texts.extend(info.keywords)
+    texts.extend(info.categories)
+    return texts
+
+def _parse_launcher(desktop_file):
+    # only plain tuples and strings are sent back from worker processes,
+    # pickling the exceptions themselves does not work for ParsingError
+    try:
+        with trace.span("parse", file=desktop_file):
+            return (desktop_file, tuple(get_launcher_info(desktop_file)[1:]),
+                    None)
+    except (ParsingError, IOError, OSError) as e:
+        return (desktop_file, None, str(e))
+
+def _parse_launcher_worker(desktop_file):
+    # the spans recorded in a worker process are sent back with its results
+    return _parse_launcher(desktop_file) + (trace.take_events(),)
+
+def parse_launchers(filenames, jobs=None):
+    """
+    Parse filenames across a pool of jobs worker processes, yielding a
+    (filename, LauncherInfo, error) tuple for each file as soon as it is
+    ready, with either the LauncherInfo or the error message set. Results are
+    not in order. Small lists are parsed in this process, as are all of them
+    if the worker processes cannot be started.
+
+    Closing the generator early terminates the worker processes.
+    """
+    if not jobs:
+        jobs = multiprocessing.cpu_count()
+    pool = None
+    if jobs > 1 and len(filenames) >= PARALLEL_MIN_FILES:
+        try:
+            pool = create_pool(jobs)
+        except OSError as e:
+            logger.warn("Could not start worker processes: %s" % e)
+    if pool:
+        results = pool.imap_unordered(_parse_launcher_worker, filenames,
+                                      get_chunksize(len(filenames), jobs,
+                                                    CHUNK_MIN_FILES))
+    else:
+        results = (_parse_launcher(filename) + (None,) for filename in filenames)
+    try:
+        for (filename, fields, error, events) in results:
+            trace.add_events(events)
+            if fields is None:
+                yield (filename, None, error)
+            else:
+                yield (filename, LauncherInfo(filename, *fields), None)
+        if pool:
+            pool.close()
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
@@ -0,0 +1,236 @@
+import os
+import logging
+import xml.etree.ElementTree as ElementTree
+
+from xdg.BaseDirectory import xdg_config_dirs, xdg_data_dirs
+from xdg.Exceptions import ParsingError
+
+logger = logging.getLogger(__name__)
+
+def find_menu_file(name="applications.menu"):
+    """
+    Return the path of the menu file which takes effect, honouring the
+    $XDG_MENU_PREFIX of the desktop, or None if there is none.
+    """
+    prefix = os.environ.get("XDG_MENU_PREFIX", "")
+    for config_dir in xdg_config_dirs:
+        for filename in (prefix + name, name):
+            path = os.path.join(config_dir, "menus", filename)
+            if os.path.isfile(path):
+                return path
+    return None
+
+def _get_directory_name(directory):
+    """
+    Return the Name of the .directory file of a menu, or None.
+    """
+    from dee.parser import DesktopFile
+
+    for data_dir in xdg_data_dirs:
+        path = os.path.join(data_dir, "desktop-directories", directory)
+        if os.path.isfile(path):
+            try:
+                return DesktopFile(path).getName() or None
+            except (ParsingError, IOError, OSError) as e:
+                logger.debug("Cannot read %s: %s" % (path, e))
+            return None
+    return None
+
+class _Rule(object):
+    """
+    A matching rule of <Include> or <Exclude>: an <Or> of its children.
+    """
+    def __init__(self, element):
+        self.kind = element.tag
+        self.text = (element.text or "").strip()
+        self.children = [_Rule(child) for child in element
+                         if child.tag in ("Filename", "Category", "All", "And",
+                                          "Or", "Not")]
+
+    def matches(self, desktop_id, categories):
+        if self.kind == "Filename":
+            return desktop_id == self.text
+        if self.kind == "Category":
+            return self.text in categories
+        if self.kind == "All":
+            return True
+        if self.kind == "And":
+            return all(child.matches(desktop_id, categories)
+                       for child in self.children)
+        found = any(child.matches(desktop_id, categories)
+                    for child in self.children)
+        if self.kind == "Not":
+            return not found
+        return found    # Or, Include and Exclude
+
+class _Menu(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.directory = None
+        self.rules = []         # (include, _Rule) in order
+        self.only_unallocated = False
+        self.deleted = False
+        self.submenus = []
+        self._by_name = {}
+
+    def get_submenu(self, name):
+        # menus with the same name at the same level are merged
+        if name not in self._by_name:
+            menu = _Menu(name)
+            self._by_name[name] = menu
+            self.submenus.append(menu)
+        return self._by_name[name]
+
+    def matches(self, desktop_id, categories):
+        # Include and Exclude are applied in order, so the last one matching
+        # the launcher decides
+        included = False
+        for include, rule in self.rules:
+            if included != include and rule.matches(desktop_id, categories):
+                included = include
+        return included
+
+class MenuLayout(object):
+    """
+    The menu layout of an XDG applications.menu file.
+
+    Only the layout is read: which menus there are and the rules which put
+    launchers in them. The launchers are matched against the desktop file IDs
+    and categories the launcher list already has, rather than by scanning and
+    parsing the applications directories again as a menu implementation
+    would. <Move>, <Layout> and the legacy directories are not supported, and
+    menus are named by their .directory files where there are any.
+    """
+
+    def __init__(self, filename=None):
+        """
+        Read the menu file filename, by default the applications.menu which
+        takes effect. Raises IOError if there is no menu file and ParsingError
+        if it cannot be parsed.
+        """
+        if filename is None:
+            filename = find_menu_file()
+            if filename is None:
+                raise IOError("No applications.menu found")
+        self.filename = filename
+        self._root = _Menu(None)
+        self._merged = set()
+        self._merge_file(filename, self._root)
+        self._names = {}
+
+    def _merge_file(self, filename, menu):
+        """
+        Merge the contents of the root <Menu> of filename into menu.
+        """
+        path = os.path.realpath(filename)
+        if path in self._merged:
+            return
+        self._merged.add(path)
+        try:
+            root = ElementTree.parse(filename).getroot()
+        except (IOError, OSError, ElementTree.ParseError) as e:
+            if menu is self._root:
+                raise ParsingError(str(e), filename)
+            logger.warn("Cannot merge %s: %s" % (filename, e))
+            return
+        if root.tag != "Menu":
+            if menu is self._root:
+                raise ParsingError("Not a menu file", filename)
+            return
+        self._read_menu(root, menu, os.path.dirname(filename), filename)
+
+    def _merge_dir(self, dirname, menu):
+        try:
+            filenames = sorted(os.listdir(dirname))
+        except OSError:
+            return
+        for filename in filenames:
+            if filename.endswith(".menu"):
+                self._merge_file(os.path.join(dirname, filename), menu)
+
+    def _merge_parent(self, filename, menu):
+        # the file with the same path in the next of the config dirs
+        for i, config_dir in enumerate(xdg_config_dirs):
+            menus_dir = os.path.join(config_dir, "menus")
+            if os.path.dirname(os.path.abspath(filename)) == menus_dir:
+                for parent_dir in xdg_config_dirs[i + 1:]:
+                    parent = os.path.join(parent_dir, "menus",
+                                          os.path.basename(filename))
+                    if os.path.isfile(parent):
+                        self._merge_file(parent, menu)
+                        return
+                return
+
+    def _read_menu(self, element, menu, base_dir, filename):
+        for child in element:
+            tag = child.tag
+            text = (child.text or "").strip()
+            if tag == "Menu":
+                name = child.findtext("Name", "").strip()
+                if name:
+                    self._read_menu(child, menu.get_submenu(name), base_dir,
+                                    filename)
+            elif tag == "Directory":
+                menu.directory = text
+            elif tag in ("Include", "Exclude"):
+                menu.rules.append((tag == "Include", _Rule(child)))
+            elif tag == "OnlyUnallocated":
+                menu.only_unallocated = True
+            elif tag == "NotOnlyUnallocated":
+                menu.only_unallocated = False
+            elif tag == "Deleted":
+                menu.deleted = True
+            elif tag == "NotDeleted":
+                menu.deleted = False
+            elif tag == "MergeFile":
+                if child.get("type") == "parent":
+                    self._merge_parent(filename, menu)
+                elif text:
+                    self._merge_file(os.path.join(base_dir, text), menu)
+            elif tag == "MergeDir" and text:
+                self._merge_dir(os.path.join(base_dir, text), menu)
+            elif tag == "DefaultMergeDirs":
+                prefix = os.environ.get("XDG_MENU_PREFIX", "")
+                for config_dir in reversed(xdg_config_dirs):
+                    self._merge_dir(os.path.join(config_dir, "menus",
+                                                 prefix + "applications-merged"),
+                                    menu)
+
+    def _get_name(self, menu):
+        if menu not in self._names:
+            name = None
+            if menu.directory:
+                name = _get_directory_name(menu.directory)
+            self._names[menu] = name or menu.name
+        return self._names[menu]
+
+    def _find(self, menu, path, desktop_id, categories, only_unallocated,
+              paths):
+        for submenu in menu.submenus:
+            if submenu.deleted:
+                continue
+            subpath = path + (self._get_name(submenu),)
+            if (submenu.only_unallocated == only_unallocated and
+                    submenu.matches(desktop_id, categories)):
+                paths.append(subpath)
+            self._find(submenu, subpath, desktop_id, categories,
+                       only_unallocated, paths)
+
+    def get_paths(self, desktop_id, categories):
+        """
+        Return the menus the launcher is shown in as a list of paths of menu
+        names, or [] if it is in none of them. A launcher in the top level
+        menu has the path ().
+        """
+        paths = []
+        root = self._root
+        if not root.only_unallocated and root.matches(desktop_id, categories):
+            paths.append(())
+        self._find(self._root, (), desktop_id, categories, False, paths)
+        if not paths:
+            # <OnlyUnallocated/> menus get the launchers no other menu took
+            if root.only_unallocated and root.matches(desktop_id, categories):
+                paths.append(())
+            self._find(self._root, (), desktop_id, categories, True, paths)
+        return paths
@@ -0,0 +1,86 @@
+import os
+import logging
+
+from gi.repository import Gio, GLib
+
+logger = logging.getLogger(__name__)
+
+class ApplicationsMonitor(object):
+    """
+    Watch the applications directories for desktop files being created,
+    changed or deleted.
+
+    Events are coalesced so that a burst of changes, such as a package install
+    dropping dozens of files, results in a single callback with the set of
+    paths that changed. The callback is responsible for checking whether each
+    path still exists.
+    """
+    COALESCE_TIMEOUT = 250 # milliseconds
+
+    def __init__(self, paths, callback):
+        """
+        Watch the "applications" directory in each of paths. callback is
+        called with a set of desktop file paths.
+        """
+        self._paths = paths
+        self._callback = callback
+        self._monitors = []
+        self._pending = set()
+        self._source = None
+
+    def start(self):
+        """
+        Start monitoring each of the applications directories which exist,
+        and their subdirectories since desktop files can be installed there
+        too. Directory monitors are not recursive, so subdirectories created
+        later are not watched until the monitor is restarted.
+        """
+        for path in self._paths:
+            path = os.path.join(path, "applications")
+            if not os.path.isdir(path):
+                continue
+            for dirpath, dirnames, filenames in os.walk(path):
+                self._monitor_directory(dirpath)
+
+    def _monitor_directory(self, path):
+        try:
+            monitor = Gio.File.new_for_path(path).monitor_directory(
+                                        Gio.FileMonitorFlags.NONE, None)
+        except GLib.GError as e:
+            logger.warn("Cannot monitor %s: %s" % (path, e))
+            return
+        monitor.connect("changed", self._on_monitor_changed)
+        self._monitors.append(monitor)
+        logger.debug("Monitoring %s" % path)
+
+    def stop(self):
+        """
+        Stop monitoring and discard any pending changes.
+        """
+        for monitor in self._monitors:
+            monitor.cancel()
+        self._monitors = []
+        self._pending.clear()
+        if self._source:
+            GLib.source_remove(self._source)
+            self._source = None
+
+    def _flush(self):
+        paths = self._pending
+        self._pending = set()
+        self._source = None
+        self._callback(paths)
+        return False
+
+    def _on_monitor_changed(self, monitor, file, other_file, event_type):
+        if event_type not in (Gio.FileMonitorEvent.CREATED,
+                              Gio.FileMonitorEvent.DELETED,
+                              Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+                              Gio.FileMonitorEvent.ATTRIBUTE_CHANGED):
+            return
+        path = file.get_path()
+        if not path or not path.endswith(".desktop"):
+            return
+        self._pending.add(path)
+        if not self._source:
+            self._source = GLib.timeout_add(self.COALESCE_TIMEOUT, self._flush)
@@ -0,0 +1,288 @@
+import os
+import re
+import sys
+
+import xdg.Locale
+from dee.fileutil import atomic_write
+from xdg.Exceptions import ParsingError
+
+DEFAULT_GROUPS = ("Desktop Entry", "KDE Desktop Entry")
+
+_LIST_SEPARATOR = re.compile(r"(?<!\\);")
+
+class DesktopFile(object):
+    """
+    A fast desktop entry parser which keeps the file exactly as it was read.
+
+    The file is stored as its list of raw lines together with, for each group,
+    a dict mapping each key to the index of the line holding it. Values are
+    only split out of their line when they are read, and key names are
+    interned so that the same keys in thousands of files share one string.
+    Comments, blank lines, key order and line endings are kept, so a file that
+    is not modified serializes back to exactly the same text.
+
+    The accessors follow the xdg.DesktopEntry API (getName(), getIcon(),
+    getExec(), ...) for the keys needed outside of the editor itself.
+    """
+    __slots__ = ("filename", "defaultGroup", "_lines", "_groups")
+
+    def __init__(self, filename=None):
+        self.filename = None
+        self.defaultGroup = None
+        # the lines are stored without their "\n", so a file ending with a
+        # newline has an empty last line
+        self._lines = [""]
+        self._groups = {}
+        if filename:
+            self.parse(filename)
+
+    def __str__(self):
+        return self.serialize()
+
+    def parse(self, filename):
+        """
+        Parse the desktop entry file filename. Raises ParsingError if the file
+        cannot be read or is not a valid desktop entry.
+        """
+        try:
+            with open(filename, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError) as e:
+            raise ParsingError(str(e), filename)
+        self.filename = filename
+        # keep undecodable bytes so that the file round-trips
+        self.parse_string(data.decode('utf-8', 'surrogateescape'))
+
+    def parse_string(self, text):
+        """
+        Parse the contents of a desktop entry file from a string.
+        """
+        # only split on \n, str.splitlines() would also split on characters
+        # such as U+2028 which may appear in values
+        lines = text.split("\n")
+        groups = {}
+        keys = None
+        intern = sys.intern
+        for index, line in enumerate(lines):
+            key, sep, value = line.partition('=')
+            key = key.strip()
+            c = key[:1]
+            if c == '#' or not (key or sep):
+                continue
+            if c == '[':
+                keys = groups[line.strip().lstrip('[').rstrip(']')] = {}
+                continue
+            if not sep:
+                raise ParsingError("Invalid line: " + line.strip(), self.filename)
+            if keys is None:
+                raise ParsingError("Parsing error on key, group missing",
+                                   self.filename)
+            keys[intern(key)] = index
+
+        for group in DEFAULT_GROUPS:
+            if group in groups:
+                self.defaultGroup = group
+                break
+        else:
+            raise ParsingError("[%s]-Header missing" % DEFAULT_GROUPS[0],
+                               self.filename)
+        self._lines = lines
+        self._groups = groups
+
+    def serialize(self):
+        """
+        Return the contents of the desktop entry file as a string.
+        """
+        return "\n".join(self._lines)
+
+    def write(self, filename=None):
+        """
+        Write the desktop entry to filename, or to the file it was read from.
+        """
+        if filename:
+            self.filename = filename
+        atomic_write(self.filename, self.serialize())
+
+    def groups(self):
+        """
+        Return the group names in the order they appear in the file.
+        """
+        groups = []
+        for index in self._group_headers():
+            group = self._lines[index].strip().lstrip('[').rstrip(']')
+            if group in self._groups and group not in groups:
+                groups.append(group)
+        return groups
+
+    def keys(self, group=None):
+        """
+        Return the keys of group, including localized keys such as Name[de],
+        in the order they appear in the file.
+        """
+        keys = self._groups.get(group or self.defaultGroup, {})
+        return sorted(keys, key=keys.get)
+
+    def hasGroup(self, group):
+        return group in self._groups
+
+    def hasKey(self, key, group=None):
+        return key in self._groups.get(group or self.defaultGroup, {})
+
+    def _value(self, index):
+        return self._lines[index].partition('=')[2].strip()
+
+    def get(self, key, group=None, locale=False, type="string", list=False):
+        """
+        Return the value of key in group (the default group if not given).
+        With locale=True the best translation for the current locale is used.
+        Missing keys return an empty string, False or [] as pyxdg does.
+        """
+        keys = self._groups.get(group or self.defaultGroup, {})
+        index = None
+        if locale and key in keys:
+            for lang in xdg.Locale.langs:
+                index = keys.get("%s[%s]" % (key, lang))
+                if index is not None:
+                    break
+        if index is None:
+            index = keys.get(key)
+        value = "" if index is None else self._value(index)
+
+        if list:
+            values = _LIST_SEPARATOR.split(value) if value else []
+            if values and values[-1] == "":
+                values.pop()
+            if type == "boolean":
+                return [v in ("true", "True", "1") for v in values]
+            return values
+        if type == "boolean":
+            return value in ("true", "True", "1")
+        return value
+
+    def set(self, key, value, group=None):
+        """
+        Set key in group to value. An existing key is changed in place and a
+        new key is added after the last key of its group.
+        """
+        group = group or self.defaultGroup
+        keys = self._groups.get(group)
+        if keys is None:
+            self.addGroup(group)
+            keys = self._groups[group]
+        index = keys.get(key)
+        if index is not None:
+            ending = "\r" if self._lines[index].endswith("\r") else ""
+            self._lines[index] = "%s=%s%s" % (key, value, ending)
+            return
+        if keys:
+            index = max(keys.values()) + 1
+        else:
+            index = self._group_header_index(group) + 1
+        self._insert_line(index, "%s=%s" % (key, value))
+        keys[sys.intern(key)] = index
+
+    def removeKey(self, key, group=None):
+        """
+        Remove key from group and return its value, or None if it was not set.
+        """
+        keys = self._groups.get(group or self.defaultGroup, {})
+        index = keys.pop(key, None)
+        if index is None:
+            return None
+        value = self._value(index)
+        del self._lines[index]
+        for keys in self._groups.values():
+            for k, i in keys.items():
+                if i > index:
+                    keys[k] = i - 1
+        return value
+
+    def addGroup(self, group):
+        """
+        Add an empty group at the end of the file.
+        """
+        if group in self._groups:
+            return
+        index = len(self._lines)
+        if self._lines[-1] == "":
+            index -= 1
+        if index > 0 and self._lines[index - 1].strip():
+            self._insert_line(index, "")
+            index += 1
+        self._insert_line(index, "[%s]" % group)
+        self._groups[group] = {}
+        if not self.defaultGroup:
+            self.defaultGroup = group
+
+    def _group_headers(self):
+        return [index for index, line in enumerate(self._lines)
+                if line.lstrip()[:1] == '[']
+
+    def _group_header_index(self, group):
+        for index in self._group_headers():
+            if self._lines[index].strip().lstrip('[').rstrip(']') == group:
+                return index
+        raise KeyError(group)
+
+    def _insert_line(self, index, line):
+        if index > 0 and self._lines[index - 1].endswith("\r"):
+            line += "\r"
+        self._lines.insert(index, line)
+        for keys in self._groups.values():
+            for k, i in keys.items():
+                if i >= index:
+                    keys[k] = i + 1
+
+    def isReadOnly(self):
+        """
+        Return True if the entry's file is read-only for this user.
+        """
+        return bool(self.filename) and not os.access(self.filename, os.W_OK)
+
+    def getType(self):
+        return self.get('Type')
+
+    def getVersionString(self):
+        return self.get('Version')
+
+    def getName(self):
+        return self.get('Name', locale=True)
+
+    def getGenericName(self):
+        return self.get('GenericName', locale=True)
+
+    def getComment(self):
+        return self.get('Comment', locale=True)
+
+    def getIcon(self):
+        return self.get('Icon', locale=True)
+
+    def getNoDisplay(self):
+        return self.get('NoDisplay', type="boolean")
+
+    def getHidden(self):
+        return self.get('Hidden', type="boolean")
+
+    def getTryExec(self):
+        return self.get('TryExec')
+
+    def getExec(self):
+        return self.get('Exec')
+
+    def getPath(self):
+        return self.get('Path')
+
+    def getTerminal(self):
+        return self.get('Terminal', type="boolean")
+
+    def getCategories(self):
+        return self.get('Categories', list=True)
+
+    def getKeywords(self):
+        return self.get('Keywords', locale=True, list=True)
+
+    def getStartupWMClass(self):
+        return self.get('StartupWMClass')
+
+    def getURL(self):
+        return self.get('URL')
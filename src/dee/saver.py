@@ -0,0 +1,88 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from gi.repository import GLib
+
+from dee import trace
+from dee.fileutil import atomic_write
+
+logger = logging.getLogger(__name__)
+
+class FileSaver(object):
+    """
+    Write files atomically in a worker thread so that saving never blocks the
+    UI on slow storage.
+
+    Saves of the same file which are queued while an earlier one is still
+    waiting are coalesced: only the latest data is written and every caller's
+    callback is told once it is on disk.
+    """
+
+    def __init__(self):
+        self._pending = OrderedDict()   # filename -> (data, [callbacks])
+        self._writing = None
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def save(self, filename, data, callback=None):
+        """
+        Queue data to be written to filename. callback is called in the main
+        thread with the filename and None, or the exception if writing failed.
+        """
+        with self._condition:
+            if filename in self._pending:
+                callbacks = self._pending[filename][1]
+                logger.debug("Coalescing save of %s" % filename)
+            else:
+                callbacks = []
+            if callback:
+                callbacks.append(callback)
+            self._pending[filename] = (data, callbacks)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run,
+                                                name="FileSaver")
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify_all()
+
+    def is_busy(self):
+        with self._condition:
+            return bool(self._pending) or self._writing is not None
+
+    def wait(self):
+        """
+        Block until all queued files have been written.
+        """
+        with self._condition:
+            while self._pending or self._writing is not None:
+                self._condition.wait()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                (filename, (data, callbacks)) = self._pending.popitem(last=False)
+                self._writing = filename
+            error = None
+            try:
+                with trace.span("save.write", file=filename):
+                    atomic_write(filename, data)
+            except (IOError, OSError) as e:
+                logger.warn("Could not save %s: %s" % (filename, e))
+                error = e
+            except Exception as e:
+                # the thread must survive, or wait() would block forever
+                logger.exception("Could not save %s" % filename)
+                error = e
+            finally:
+                with self._condition:
+                    self._writing = None
+                    self._condition.notify_all()
+            for callback in callbacks:
+                GLib.idle_add(self._finish, callback, filename, error)
+
+    def _finish(self, callback, filename, error):
+        callback(filename, error)
+        return False
@@ -0,0 +1,192 @@
+import logging
+import threading
+
+from gi.repository import GLib
+
+from dee import trace
+from dee.cache import EntryCache
+from dee.desktopindex import DesktopFileIndex
+from dee.launcherinfo import LauncherInfo, parse_launchers
+
+logger = logging.getLogger(__name__)
+
+class LauncherScanner(object):
+    """
+    Scan the applications directories for desktop entries in a worker thread.
+
+    Parsed entries are handed to the GTK+ main loop in batches from idle
+    callbacks so that rows can be added to the list as soon as they are found
+    without blocking the UI. All callbacks are invoked in the main thread.
+    The parsing itself is spread over a pool of worker processes, since it is
+    CPU-bound Python which a thread cannot run on more than one core.
+    """
+    BATCH_SIZE = 50
+
+    def __init__(self, paths, batch_callback, done_callback,
+                 progress_callback=None, cache=True, index_callback=None,
+                 jobs=None):
+        """
+        Scan the *.desktop files in each of paths, in order of precedence.
+        Only the file which takes effect for each desktop file ID is parsed.
+
+        index_callback is called with the DesktopFileIndex of the files found
+        before any batch is delivered. batch_callback is called with a list of
+        LauncherInfo objects, progress_callback with the number of files
+        scanned and the total, and done_callback once the scan has finished.
+        No callbacks are made after cancel() has been called.
+
+        If cache is True only the files which changed since the last scan are
+        parsed and the rest are read from the on-disk EntryCache. The files
+        are parsed across jobs worker processes, one per CPU by default.
+        """
+        self._paths = paths
+        self._use_cache = cache
+        self._batch_callback = batch_callback
+        self._done_callback = done_callback
+        self._progress_callback = progress_callback
+        self._index_callback = index_callback
+        self._jobs = jobs
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    def cancel(self):
+        """
+        Stop the scan. Batches already queued on the main loop are discarded.
+        """
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Start scanning in a new worker thread.
+        """
+        self._thread = threading.Thread(target=self._run, name="LauncherScanner")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _deliver(self, batch, scanned, total, done):
+        """
+        Idle callback run in the main thread to hand over a batch of results.
+        """
+        if self._cancelled.is_set():
+            return False
+        if batch:
+            self._batch_callback(batch)
+        if self._progress_callback:
+            self._progress_callback(scanned, total)
+        if done:
+            self._done_callback()
+        return False
+
+    def _deliver_index(self, index):
+        if not self._cancelled.is_set():
+            self._index_callback(index)
+        return False
+
+    def _find_files(self):
+        """
+        Return the DesktopFileIndex of the files and the files which take
+        effect, skipping the overridden ones.
+        """
+        index = DesktopFileIndex(self._paths)
+        with trace.span("scan.find_files"):
+            index.scan()
+        logger.debug("Found %d desktop file IDs" % len(index))
+        if self._index_callback:
+            GLib.idle_add(self._deliver_index, index)
+        return (index, index.get_effective_files())
+
+    def _add(self, info):
+        """
+        Count a scanned file and queue its LauncherInfo, if any, in a batch.
+        """
+        self._scanned += 1
+        if info is not None:
+            self._batch.append(info)
+        if len(self._batch) >= self.BATCH_SIZE:
+            GLib.idle_add(self._deliver, self._batch, self._scanned, self._total,
+                          False)
+            self._batch = []
+
+    def _scan(self, index, files, cache):
+        """
+        Queue the LauncherInfo of each of files, taking unchanged files from
+        the cache and parsing the rest in worker processes. The stat results
+        the cache is keyed by come from the walk of the index. Returns False
+        if the scan was cancelled.
+        """
+        stats = {}
+        unparsed = []
+        for desktop_file in files:
+            if self._cancelled.is_set():
+                return False
+            if cache is None:
+                unparsed.append(desktop_file)
+                continue
+            try:
+                st = index.get_stat(desktop_file)
+            except OSError as e:
+                logger.warn(e)
+                self._add(None)
+                continue
+            fields = cache.get(desktop_file, st)
+            if fields:
+                self._add(LauncherInfo(desktop_file, *fields))
+            else:
+                stats[desktop_file] = st
+                unparsed.append(desktop_file)
+
+        logger.debug("Parsing %d of %d desktop files" % (len(unparsed), len(files)))
+        results = parse_launchers(unparsed, self._jobs)
+        with trace.span("scan.parse", files=len(unparsed)):
+            try:
+                for (desktop_file, info, error) in results:
+                    if self._cancelled.is_set():
+                        return False
+                    if error:
+                        logger.warn(error)
+                    elif cache is not None:
+                        cache.set(desktop_file, stats[desktop_file], info[1:])
+                    self._add(info)
+            finally:
+                # stops the worker processes if the scan was cancelled
+                results.close()
+        return True
+
+    def _run(self):
+        """
+        Worker thread: parse each desktop file and queue the results.
+        """
+        self._total = 0
+        self._scanned = 0
+        self._batch = []
+        try:
+            with trace.span("scan"):
+                cache = None
+                if self._use_cache:
+                    cache = EntryCache()
+                    cache.load()
+                (index, files) = self._find_files()
+                self._total = len(files)
+                try:
+                    scanned = self._scan(index, files, cache)
+                finally:
+                    index.clear_stats()
+                if scanned:
+                    if cache is not None:
+                        cache.prune(files)
+                    GLib.idle_add(self._deliver, self._batch, self._total,
+                                  self._total, True)
+                if cache is not None:
+                    cache.save()
+        except Exception:
+            # finish the scan with what was found so that the list does not
+            # keep showing that it is loading
+            logger.exception("Scanning the applications directories failed")
+            GLib.idle_add(self._deliver, self._batch, self._scanned,
+                          self._total, True)
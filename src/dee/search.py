@@ -0,0 +1,122 @@
+import re
+import bisect
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+def get_words(text):
+    """
+    Return the lower case words in text.
+    """
+    return _WORD.findall(text.lower())
+
+def _deletions(word):
+    """
+    Return the set of strings made by deleting one character from word.
+    """
+    return set(word[:i] + word[i + 1:] for i in range(len(word)))
+
+class SearchIndex(object):
+    """
+    In-memory inverted index from words to the desktop files containing them.
+
+    Documents are added and removed one at a time as the launcher list
+    changes. Queries match every document containing, for each word of the
+    query, a word starting with it. Fuzzy matching also accepts words within
+    one typo of the query word.
+    """
+    FUZZY_MIN_LENGTH = 4
+
+    def __init__(self):
+        self._postings = {}     # word -> set of documents
+        self._documents = {}    # document -> tuple of words
+        self._variants = {}     # word or one-character deletion -> set of words
+        self._sorted_words = None
+
+    def __len__(self):
+        return len(self._documents)
+
+    def clear(self):
+        self._postings.clear()
+        self._documents.clear()
+        self._variants.clear()
+        self._sorted_words = None
+
+    def add(self, document, texts):
+        """
+        Index document, replacing any earlier version of it, under the words
+        found in each of texts.
+        """
+        self.remove(document)
+        words = set()
+        for text in texts:
+            if text:
+                words.update(get_words(text))
+        for word in words:
+            postings = self._postings.get(word)
+            if postings is None:
+                postings = self._postings[word] = set()
+                self._sorted_words = None
+                for variant in _deletions(word) | set((word,)):
+                    self._variants.setdefault(variant, set()).add(word)
+            postings.add(document)
+        self._documents[document] = tuple(words)
+
+    def remove(self, document):
+        """
+        Remove document from the index.
+        """
+        words = self._documents.pop(document, None)
+        if not words:
+            return
+        for word in words:
+            postings = self._postings[word]
+            postings.discard(document)
+            if not postings:
+                del self._postings[word]
+                self._sorted_words = None
+                for variant in _deletions(word) | set((word,)):
+                    variant_words = self._variants[variant]
+                    variant_words.discard(word)
+                    if not variant_words:
+                        del self._variants[variant]
+
+    def _prefix_words(self, prefix):
+        if self._sorted_words is None:
+            self._sorted_words = sorted(self._postings)
+        words = self._sorted_words
+        start = bisect.bisect_left(words, prefix)
+        end = bisect.bisect_left(words, prefix + u"\U0010ffff", start)
+        return words[start:end]
+
+    def _fuzzy_words(self, word):
+        """
+        Return the indexed words within one insertion, deletion or
+        substitution of word.
+        """
+        # two words are within one typo of each other if they share a word
+        # made by deleting at most one character from each
+        matches = set()
+        for variant in _deletions(word) | set((word,)):
+            matches.update(self._variants.get(variant, ()))
+        return matches
+
+    def search(self, query, fuzzy=True):
+        """
+        Return the set of documents matching every word in query, or None if
+        the query has no words.
+        """
+        results = None
+        for word in get_words(query):
+            documents = set()
+            for match in self._prefix_words(word):
+                documents.update(self._postings[match])
+            if fuzzy and len(word) >= self.FUZZY_MIN_LENGTH:
+                for match in self._fuzzy_words(word):
+                    documents.update(self._postings[match])
+            if results is None:
+                results = documents
+            else:
+                results &= documents
+            if not results:
+                break
+        return results
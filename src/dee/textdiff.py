@@ -0,0 +1,44 @@
+import re
+import difflib
+
+# a line and its terminator, which like in a GtkTextBuffer is "\r\n", "\r",
+# "\n" or U+2029 (the paragraph separator)
+_LINE = re.compile("[^\r\n\u2029]*(?:\r\n|[\r\n\u2029])|[^\r\n\u2029]+")
+
+def split_lines(text):
+    """
+    Split text into lines, keeping the terminator on each line. Lines end
+    where they do in a GtkTextBuffer, so the line numbers match those of the
+    buffer. Unlike str.splitlines() characters such as U+2028 or form feeds
+    do not end a line.
+    """
+    return _LINE.findall(text)
+
+def line_changes(old_lines, new_lines):
+    """
+    Return the changes needed to turn old_lines into new_lines as a list of
+    (start, end, lines) tuples meaning that old_lines[start:end] is replaced by
+    lines. The changes are in reverse order so that they can be applied one
+    after the other without adjusting the line numbers of the rest.
+    """
+    # strip the common head and tail first, a typical edit changes one line
+    # and SequenceMatcher then only has to look at a few lines
+    prefix = 0
+    limit = min(len(old_lines), len(new_lines))
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+    old_middle = old_lines[prefix:len(old_lines) - suffix]
+    new_middle = new_lines[prefix:len(new_lines) - suffix]
+
+    changes = []
+    matcher = difflib.SequenceMatcher(None, old_middle, new_middle,
+                                      autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != 'equal':
+            changes.append((prefix + i1, prefix + i2, new_middle[j1:j2]))
+    changes.reverse()
+    return changes
@@ -0,0 +1,35 @@
+import time
+import logging
+
+from dee import trace
+
+logger = logging.getLogger(__name__)
+
+# imported by the launcher scripts before anything else, so this is as close
+# to the start of the process as we can get
+START = time.time()
+
+_marks = []
+
+def mark(name):
+    """
+    Record that the startup phase name has been reached.
+    """
+    _marks.append((name, time.time() - START))
+    trace.instant(name)
+
+def get_marks():
+    """
+    Return the list of (name, seconds since startup) tuples recorded so far.
+    """
+    return list(_marks)
+
+def report():
+    """
+    Log the startup phases recorded so far and the time between them.
+    """
+    last = 0.0
+    for name, elapsed in _marks:
+        logger.debug("startup: %-16s %8.1f ms (+%.1f ms)" % (name, elapsed * 1000,
+                                                             (elapsed - last) * 1000))
+        last = elapsed
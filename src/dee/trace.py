@@ -0,0 +1,221 @@
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+import functools
+
+from dee.fileutil import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# set to the name of a file to write a trace to when the process exits
+ENV_VAR = "DEE_TRACE"
+
+_enabled = False
+_filename = None
+_events = []        # Chrome trace events, appended to from any thread
+_threads = {}       # (pid, tid) -> thread name
+
+class _Span(object):
+    """
+    Time the code in a with statement and record it as a complete event.
+    """
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        end = time.perf_counter()
+        _record(self.name, "X", self.start, self.args, end - self.start)
+        return False
+
+class _NullSpan(object):
+    """
+    Returned by span() while tracing is off, so a disabled span costs a
+    function call and two method calls which do nothing.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+def _record(name, phase, start, args, duration=None):
+    # the clock of time.perf_counter() is shared by all processes on Linux,
+    # so the events of worker processes line up with those of the main one
+    event = {"name": name, "ph": phase, "ts": round(start * 1000000, 3),
+             "pid": os.getpid(), "tid": threading.current_thread().ident}
+    if duration is not None:
+        event["dur"] = round(duration * 1000000, 3)
+    if args:
+        event["args"] = args
+    key = (event["pid"], event["tid"])
+    if key not in _threads:
+        _threads[key] = threading.current_thread().name
+    _events.append(event)
+
+def is_enabled():
+    return _enabled
+
+def span(name, **args):
+    """
+    Return a context manager which records the time spent in its block as a
+    span named name, with args as its details in the trace.
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+def traced(name):
+    """
+    Decorator recording every call of a function as a span named name.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def instant(name, **args):
+    """
+    Record that name happened now, such as reaching a startup phase.
+    """
+    if _enabled:
+        _record(name, "i", time.perf_counter(), args)
+
+def take_events():
+    """
+    Remove and return the events recorded in this process so far. Worker
+    processes return these with their results to be passed to add_events()
+    in the main process. Returns None while tracing is off.
+    """
+    if not _enabled:
+        return None
+    events = _events[:]
+    del _events[:len(events)]
+    return (events, dict(_threads))
+
+def add_events(events):
+    """
+    Add the events returned by take_events() in another process.
+    """
+    if events:
+        _events.extend(events[0])
+        _threads.update(events[1])
+
+def init_worker(enabled):
+    """
+    Initialize a worker process started by the main one, recording spans if
+    enabled is True. The events are sent back with take_events() and the
+    main process writes the trace, workers never write one themselves.
+    """
+    global _enabled, _filename
+    del _events[:]
+    _threads.clear()
+    _enabled = enabled
+    _filename = None
+
+def _after_fork_in_child():
+    # a worker process must not send back the events of its parent
+    del _events[:]
+    _threads.clear()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+def enable(filename):
+    """
+    Start tracing and write the trace to filename when the process exits.
+    """
+    global _enabled, _filename
+    if _filename is None:
+        atexit.register(_write_at_exit)
+    _filename = filename
+    _enabled = True
+    logger.debug("Tracing to %s" % filename)
+
+def enable_from_args(argv):
+    """
+    Enable tracing if the DEE_TRACE environment variable is set or argv has
+    a --trace FILE option, and return argv without it.
+    """
+    argv = list(argv)
+    filename = os.environ.get(ENV_VAR)
+    for i, arg in enumerate(argv):
+        if arg == "--trace" and i + 1 < len(argv):
+            filename = argv[i + 1]
+            del argv[i:i + 2]
+            break
+        if arg.startswith("--trace="):
+            filename = arg[len("--trace="):]
+            del argv[i]
+            break
+    if filename:
+        enable(filename)
+    return argv
+
+def get_summary():
+    """
+    Return a list of (name, count, total, mean, max) tuples, times in
+    milliseconds, for the spans recorded so far, the most expensive first.
+    """
+    stages = {}
+    for event in list(_events):
+        if event["ph"] != "X":
+            continue
+        stage = stages.setdefault(event["name"], [0, 0.0, 0.0])
+        stage[0] += 1
+        stage[1] += event["dur"]
+        stage[2] = max(stage[2], event["dur"])
+    summary = [(name, count, total / 1000, total / count / 1000, longest / 1000)
+               for name, (count, total, longest) in stages.items()]
+    summary.sort(key=lambda stage: stage[2], reverse=True)
+    return summary
+
+def format_summary():
+    lines = ["%-28s %8s %12s %10s %10s" % ("span", "count", "total ms",
+                                            "mean ms", "max ms")]
+    for stage in get_summary():
+        lines.append("%-28s %8d %12.2f %10.3f %10.3f" % stage)
+    return "\n".join(lines) + "\n"
+
+def write(filename):
+    """
+    Write the events recorded so far to filename in the Chrome trace event
+    format, which chrome://tracing and Perfetto can open, along with a text
+    summary of each span in filename.txt.
+    """
+    events = list(_events)
+    for (pid, tid), name in list(_threads.items()):
+        events.append({"name": "thread_name", "ph": "M", "pid": pid,
+                       "tid": tid, "args": {"name": name}})
+    atomic_write(filename, json.dumps({"traceEvents": events,
+                                       "displayTimeUnit": "ms"}))
+    atomic_write(filename + ".txt", format_summary())
+
+def _write_at_exit():
+    if not _enabled or not _filename:
+        return
+    try:
+        write(_filename)
+    except (IOError, OSError) as e:
+        logger.warn("Could not write trace %s: %s" % (_filename, e))
+        return
+    sys.stderr.write("Trace written to %s\n%s" % (_filename, format_summary()))
@@ -0,0 +1,73 @@
+import os
+import time
+import multiprocessing
+
+from dee.desktopindex import walk_entry_files
+from dee.workers import create_pool, get_chunksize
+from xdg.Exceptions import ParsingError, ValidationError
+
+ENTRY_EXTENSIONS = (".desktop", ".directory")
+
+def find_entry_files(paths):
+    """
+    Return the desktop entry files in paths. Directories are searched
+    recursively for *.desktop and *.directory files, other paths are used
+    as they are.
+    """
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        files.extend(entry.path for desktop_id, entry
+                     in walk_entry_files(path, ENTRY_EXTENSIONS))
+    return files
+
+def validate_file(filename):
+    """
+    Validate a single desktop entry file and return a dict with the file name,
+    the lists of errors and warnings and the time taken in seconds.
+    """
+    # imported here, pyxdg's parser is only needed to validate
+    from dee.entry import Entry
+
+    start = time.time()
+    errors = []
+    warnings = []
+    try:
+        entry = Entry(filename)
+        try:
+            entry.validate()
+        except ValidationError:
+            pass
+        errors = list(entry.errors)
+        warnings = list(entry.warnings)
+    except (ParsingError, IOError, OSError) as e:
+        errors = [str(e)]
+    return {
+        "file": filename,
+        "errors": errors,
+        "warnings": warnings,
+        "time": round(time.time() - start, 6),
+    }
+
+def validate_files(filenames, jobs=None):
+    """
+    Validate filenames across a pool of jobs worker processes, yielding the
+    result of each file as soon as it is ready. Results are not in order.
+    """
+    if not jobs:
+        jobs = multiprocessing.cpu_count()
+    if jobs == 1 or len(filenames) < 2:
+        for filename in filenames:
+            yield validate_file(filename)
+        return
+    pool = create_pool(jobs)
+    try:
+        for result in pool.imap_unordered(validate_file, filenames,
+                                          get_chunksize(len(filenames), jobs)):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,29 @@
+import multiprocessing
+
+from dee import trace
+
+# Shared by the launcher list, the batch editing and the validation. This
+# module is loaded at startup, so it must import neither pyxdg nor GTK+.
+
+def get_chunksize(count, jobs, minimum=1):
+    """
+    Return the number of files to send to a worker process at a time. Chunks
+    are large enough to keep IPC overhead low but small enough that each worker
+    gets several of them to balance the load. Chunks have at least minimum
+    files, for work so cheap per file that smaller chunks cost more in IPC.
+    """
+    return max(minimum, min(64, count // (jobs * 4)))
+
+def create_pool(jobs):
+    """
+    Return a multiprocessing.Pool of jobs worker processes. The workers are
+    started from a fork server, or spawned where there is none, rather than
+    forked from this process: the GUI runs GTK+ and other threads which are
+    not safe to fork. Raises OSError if the processes cannot be started.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+    else:
+        context = multiprocessing.get_context("spawn")
+    # trace.init_worker() tells each worker whether to record spans
+    return context.Pool(jobs, trace.init_worker, (trace.is_enabled(),))
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the tests use the modules which do not need GTK+, straight from the tree
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "src"))
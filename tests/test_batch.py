@@ -0,0 +1,133 @@
+import os
+
+import pytest
+
+from dee import batch
+
+ENTRY = ("# keep me\n"
+         "[Desktop Entry]\n"
+         "Type=Application\n"
+         "Name=%s\n"
+         "Exec=%s --flag\n")
+
+def make_files(tmp_path, count=3):
+    filenames = []
+    for i in range(count):
+        path = tmp_path / ("app-%d.desktop" % i)
+        path.write_text(ENTRY % ("App %d" % i, "app%d" % i))
+        filenames.append(str(path))
+    return filenames
+
+def read(filename):
+    with open(filename) as f:
+        return f.read()
+
+def temp_files(tmp_path):
+    return [name for name in os.listdir(str(tmp_path)) if name.startswith(".")]
+
+def test_edit_and_commit(tmp_path):
+    filenames = make_files(tmp_path)
+    operations = [(batch.SET, "Terminal", "false"),
+                  (batch.REPLACE, "Exec", "--flag", "--other")]
+    results = batch.edit_files(filenames, operations, jobs=1, stage=True)
+    assert all(result["changed"] and not result["error"] for result in results)
+    assert batch.commit(results) == 3
+    assert read(filenames[0]) == ("# keep me\n"
+                                  "[Desktop Entry]\n"
+                                  "Type=Application\n"
+                                  "Name=App 0\n"
+                                  "Exec=app0 --other\n"
+                                  "Terminal=false\n")
+    assert temp_files(tmp_path) == []
+
+def test_edit_in_worker_processes(tmp_path):
+    filenames = make_files(tmp_path, 4)
+    results = batch.edit_files(filenames, [(batch.SET, "Name", "Changed")],
+                               jobs=2)
+    assert sorted(result["file"] for result in results) == filenames
+    assert all(result["changed"] for result in results)
+
+def test_dry_run_writes_nothing(tmp_path):
+    filenames = make_files(tmp_path, 1)
+    results = batch.edit_files(filenames, [(batch.REMOVE, "Exec")], jobs=1)
+    assert results[0]["changed"]
+    assert "-Exec=app0 --flag" in results[0]["diff"]
+    assert results[0]["staged"] is None
+    assert read(filenames[0]) == ENTRY % ("App 0", "app0")
+
+def test_commit_rolls_back_when_a_rename_fails(tmp_path, monkeypatch):
+    filenames = make_files(tmp_path)
+    results = batch.edit_files(filenames, [(batch.SET, "Name", "Changed")],
+                               jobs=1, stage=True)
+    rename = os.rename
+    renamed = []
+    def failing_rename(src, dst):
+        # the third file cannot be replaced, the other two already were
+        if len(renamed) == 2:
+            renamed.append(None)
+            raise OSError(13, "Permission denied", dst)
+        rename(src, dst)
+        renamed.append(dst)
+    monkeypatch.setattr(batch.os, "rename", failing_rename)
+    with pytest.raises(OSError):
+        batch.commit(results)
+    for i, filename in enumerate(filenames):
+        assert read(filename) == ENTRY % ("App %d" % i, "app%d" % i)
+    assert temp_files(tmp_path) == []
+
+def test_commit_writes_nothing_if_any_file_failed(tmp_path):
+    filenames = make_files(tmp_path, 2)
+    (tmp_path / "broken.desktop").write_text("Name=no group\n")
+    filenames.append(str(tmp_path / "broken.desktop"))
+    results = batch.edit_files(filenames, [(batch.SET, "Name", "Changed")],
+                               jobs=1, stage=True)
+    assert [bool(result["error"]) for result in results] == [False, False, True]
+    assert batch.commit(results) == 0
+    assert read(filenames[0]) == ENTRY % ("App 0", "app0")
+    assert temp_files(tmp_path) == []
+
+def test_commit_rejects_staged_files_which_do_not_parse(tmp_path):
+    filenames = make_files(tmp_path, 2)
+    results = batch.edit_files(filenames, [(batch.SET, "Name", "Changed")],
+                               jobs=1, stage=True)
+    with open(results[1]["staged"], "w") as f:
+        f.write("not a desktop entry\n")
+    with pytest.raises(ValueError):
+        batch.commit(results)
+    assert read(filenames[0]) == ENTRY % ("App 0", "app0")
+    assert temp_files(tmp_path) == []
+
+def test_replace_with_group_reference(tmp_path):
+    filenames = make_files(tmp_path, 1)
+    operations = [(batch.REPLACE, "Exec", r"(app\d) (--flag)", r"\2 \1")]
+    batch.check_operations(operations)
+    results = batch.edit_files(filenames, operations, jobs=1)
+    assert "+Exec=--flag app0" in results[0]["diff"]
+
+@pytest.mark.parametrize("value", ["a\nb", "a\rb", "a\r\n"])
+def test_set_rejects_line_breaks(value):
+    with pytest.raises(ValueError):
+        batch.check_operations([(batch.SET, "Name", value)])
+
+def test_replace_rejects_line_breaks(tmp_path):
+    filenames = make_files(tmp_path, 1)
+    results = batch.edit_files(filenames,
+                               [(batch.REPLACE, "Exec", "--flag", "x\nType=Link")],
+                               jobs=1, stage=True)
+    assert "line break" in results[0]["error"]
+    assert results[0]["staged"] is None
+    assert batch.commit(results) == 0
+    assert read(filenames[0]) == ENTRY % ("App 0", "app0")
+
+@pytest.mark.parametrize("operation", [
+    (batch.SET, "", "value"),
+    (batch.SET, "Name=", "value"),
+    (batch.REPLACE, "Name", "(", "x"),
+    (batch.REPLACE, "Exec", "foo", r"\9"),
+    (batch.REPLACE, "Exec", "(foo)", r"\g<name>"),
+    (batch.REPLACE, "Exec", "foo", "\\"),
+    ("rename", "Name"),
+])
+def test_invalid_operations(operation):
+    with pytest.raises(ValueError):
+        batch.check_operations([operation])
@@ -0,0 +1,68 @@
+from dee.entry import Entry
+
+ENTRY = (b"#!/usr/bin/env xdg-open\r\n"
+         b"# A comment\r\n"
+         b"[Desktop Entry]\r\n"
+         b"Type=Application\r\n"
+         b"Name = Foo\r\n"
+         b"Name[de]=F\xc3\xbc\r\n"
+         b"\r\n"
+         b"Exec=foo %U\r\n"
+         b"X-Legacy=\xff\xfe\r\n"
+         b"\r\n"
+         b"[Desktop Action New]\r\n"
+         b"Name=New Window\r\n"
+         b"Exec=foo --new\r\n")
+
+def write_entry(tmp_path, data=ENTRY):
+    path = tmp_path / "foo.desktop"
+    path.write_bytes(data)
+    return str(path)
+
+def test_unchanged_save_is_identical(tmp_path):
+    filename = write_entry(tmp_path)
+    Entry(filename).write()
+    assert open(filename, "rb").read() == ENTRY
+
+def test_unchanged_save_as_is_identical(tmp_path):
+    entry = Entry(write_entry(tmp_path))
+    copy = str(tmp_path / "copy.desktop")
+    entry.write(copy)
+    assert open(copy, "rb").read() == ENTRY
+
+def test_edit_keeps_the_rest_of_the_file(tmp_path):
+    filename = write_entry(tmp_path)
+    entry = Entry(filename)
+    entry.set("Name", "Bar")
+    entry.set("Comment", "Does things")
+    entry.removeKey("X-Legacy")
+    entry.write()
+    assert open(filename, "rb").read() == (b"#!/usr/bin/env xdg-open\r\n"
+                                          b"# A comment\r\n"
+                                          b"[Desktop Entry]\r\n"
+                                          b"Type=Application\r\n"
+                                          b"Name=Bar\r\n"
+                                          b"Name[de]=F\xc3\xbc\r\n"
+                                          b"\r\n"
+                                          b"Exec=foo %U\r\n"
+                                          b"Comment=Does things\r\n"
+                                          b"\r\n"
+                                          b"[Desktop Action New]\r\n"
+                                          b"Name=New Window\r\n"
+                                          b"Exec=foo --new\r\n")
+
+def test_content(tmp_path):
+    entry = Entry(write_entry(tmp_path))
+    assert list(entry.content) == ["Desktop Entry", "Desktop Action New"]
+    assert entry.content["Desktop Entry"]["Name"] == "Foo"
+    assert entry.content["Desktop Action New"]["Exec"] == "foo --new"
+
+def test_new(tmp_path):
+    filename = str(tmp_path / "new.desktop")
+    entry = Entry()
+    entry.new(filename)
+    entry.set("Name", "Untitled")
+    entry.write()
+    assert open(filename).read() == ("[Desktop Entry]\n"
+                                     "Type=Application\n"
+                                     "Name=Untitled\n")
@@ -0,0 +1,47 @@
+import pytest
+
+from dee.execline import expand_field_codes, get_exec_binary, split_exec
+
+@pytest.mark.parametrize("exec_line, expected", [
+    ("vlc %f", ["vlc"]),
+    ("vlc %u", ["vlc"]),
+    ("vlc %F", ["vlc"]),
+    ("vlc %U", ["vlc"]),
+    ("vlc --play %f --fullscreen", ["vlc", "--play", "--fullscreen"]),
+])
+def test_file_codes_without_documents_expand_to_nothing(exec_line, expected):
+    assert expand_field_codes(exec_line) == expected
+
+def test_file_codes():
+    files = ["/tmp/a b.ogg", "/tmp/c.ogg"]
+    urls = ["http://example.com/d.ogg"]
+    assert expand_field_codes("vlc %f", files) == ["vlc", "/tmp/a b.ogg"]
+    assert expand_field_codes("vlc %F", files) == ["vlc"] + files
+    assert expand_field_codes("vlc %u", files, urls) == ["vlc", urls[0]]
+    assert expand_field_codes("vlc %U", files, urls) == ["vlc"] + urls + files
+    assert expand_field_codes("vlc --file=%f", files) == ["vlc",
+                                                          "--file=/tmp/a b.ogg"]
+
+def test_other_codes():
+    assert expand_field_codes("foo %i %c %k", name="Foo", icon="foo-icon",
+                              location="/usr/share/applications/foo.desktop") \
+        == ["foo", "--icon", "foo-icon", "Foo",
+            "/usr/share/applications/foo.desktop"]
+    assert expand_field_codes("foo %i") == ["foo"]
+    assert expand_field_codes("foo 100%%") == ["foo", "100%"]
+    assert expand_field_codes("foo %d %D %n %N %v %m") == ["foo"]
+
+def test_quoting():
+    assert expand_field_codes('"/opt/my app/run" --title "A %c"', name="B") \
+        == ["/opt/my app/run", "--title", "A B"]
+    assert expand_field_codes('foo "unterminated') == []
+    assert split_exec('foo "a b" c') == ["foo", "a b", "c"]
+
+@pytest.mark.parametrize("exec_line, expected", [
+    ("foo --bar %U", "foo"),
+    ("/usr/bin/foo", "/usr/bin/foo"),
+    ("env LANG=C FOO=1 foo %f", "foo"),
+    ("", ""),
+])
+def test_get_exec_binary(exec_line, expected):
+    assert get_exec_binary(exec_line) == expected
@@ -0,0 +1,25 @@
+import os
+
+from dee.fileutil import atomic_write
+
+def test_atomic_write(tmp_path):
+    path = tmp_path / "a.desktop"
+    path.write_text("old")
+    os.chmod(str(path), 0o640)
+    atomic_write(str(path), "new")
+    assert path.read_text() == "new"
+    assert os.stat(str(path)).st_mode & 0o777 == 0o640
+    assert os.listdir(str(tmp_path)) == ["a.desktop"]
+
+def test_atomic_write_keeps_symlink(tmp_path):
+    (tmp_path / "real").mkdir()
+    (tmp_path / "apps").mkdir()
+    target = tmp_path / "real" / "a.desktop"
+    target.write_text("old")
+    link = tmp_path / "apps" / "a.desktop"
+    link.symlink_to(os.path.join("..", "real", "a.desktop"))
+    atomic_write(str(link), "new")
+    assert link.is_symlink()
+    assert target.read_text() == "new"
+    assert os.listdir(str(tmp_path / "apps")) == ["a.desktop"]
+    assert os.listdir(str(tmp_path / "real")) == ["a.desktop"]
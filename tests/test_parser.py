@@ -0,0 +1,93 @@
+import pytest
+
+from dee.parser import DesktopFile
+from xdg.Exceptions import ParsingError
+
+TEXT = ("# Generated by hand\n"
+        "[Desktop Entry]\n"
+        "Type=Application\n"
+        "Name=Foo\n"
+        "Name[de]=Fu\n"
+        "\n"
+        "Exec = foo %U\n"
+        "Categories=Utility;Development;\n"
+        "Terminal=true\n"
+        "\n"
+        "[Desktop Action New]\n"
+        "Name=New Window\n"
+        "Exec=foo --new\n")
+
+def parse(text):
+    desktop_file = DesktopFile()
+    desktop_file.parse_string(text)
+    return desktop_file
+
+@pytest.mark.parametrize("text", [
+    TEXT,
+    TEXT.replace("\n", "\r\n"),
+    TEXT.rstrip("\n"),
+    "[Desktop Entry]\nName=Caf\udce9\n",    # undecodable byte
+    "[Desktop Entry]\nComment=a b\n",
+])
+def test_round_trip(text):
+    assert parse(text).serialize() == text
+
+def test_round_trip_file(tmp_path):
+    data = TEXT.replace("\n", "\r\n").encode("utf-8") + b"X-Bytes=\xff\r\n"
+    path = tmp_path / "foo.desktop"
+    path.write_bytes(data)
+    desktop_file = DesktopFile(str(path))
+    desktop_file.write()
+    assert path.read_bytes() == data
+
+def test_get():
+    desktop_file = parse(TEXT)
+    assert desktop_file.defaultGroup == "Desktop Entry"
+    assert desktop_file.getName() == "Foo"
+    assert desktop_file.getExec() == "foo %U"
+    assert desktop_file.getCategories() == ["Utility", "Development"]
+    assert desktop_file.getTerminal() is True
+    assert desktop_file.getIcon() == ""
+    assert desktop_file.get("Exec", "Desktop Action New") == "foo --new"
+    assert desktop_file.groups() == ["Desktop Entry", "Desktop Action New"]
+    assert desktop_file.keys() == ["Type", "Name", "Name[de]", "Exec",
+                                   "Categories", "Terminal"]
+
+def test_set_changes_only_its_line():
+    desktop_file = parse(TEXT.replace("\n", "\r\n"))
+    desktop_file.set("Name", "Bar")
+    assert desktop_file.serialize() == TEXT.replace(
+        "Name=Foo", "Name=Bar").replace("\n", "\r\n")
+
+def test_set_new_key_after_last_key_of_group():
+    desktop_file = parse(TEXT)
+    desktop_file.set("Icon", "foo")
+    desktop_file.set("Icon", "foo-new", "Desktop Action New")
+    assert desktop_file.serialize() == TEXT.replace(
+        "Terminal=true\n", "Terminal=true\nIcon=foo\n").replace(
+        "Exec=foo --new\n", "Exec=foo --new\nIcon=foo-new\n")
+    assert desktop_file.getIcon() == "foo"
+    assert desktop_file.get("Exec", "Desktop Action New") == "foo --new"
+
+def test_remove_key():
+    desktop_file = parse(TEXT)
+    assert desktop_file.removeKey("Name[de]") == "Fu"
+    assert desktop_file.removeKey("Icon") is None
+    assert desktop_file.serialize() == TEXT.replace("Name[de]=Fu\n", "")
+    assert desktop_file.getExec() == "foo %U"
+    assert desktop_file.get("Name", "Desktop Action New") == "New Window"
+
+def test_add_group():
+    desktop_file = parse("[Desktop Entry]\nName=Foo\n")
+    desktop_file.set("Exec", "foo", "Desktop Action Bar")
+    assert desktop_file.serialize() == ("[Desktop Entry]\nName=Foo\n\n"
+                                        "[Desktop Action Bar]\nExec=foo\n")
+
+@pytest.mark.parametrize("text", [
+    "Name=Foo\n",
+    "[Other Group]\nName=Foo\n",
+    "[Desktop Entry]\nthis line has no equals sign\n",
+])
+def test_invalid(text):
+    with pytest.raises(ParsingError):
+        parse(text)
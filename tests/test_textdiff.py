@@ -0,0 +1,46 @@
+import pytest
+
+from dee.textdiff import line_changes, split_lines
+
+def apply_changes(lines, changes):
+    lines = list(lines)
+    for start, end, new_lines in changes:
+        lines[start:end] = new_lines
+    return lines
+
+def test_split_lines():
+    assert split_lines("") == []
+    assert split_lines("a\nb") == ["a\n", "b"]
+    assert split_lines("a\nb\n") == ["a\n", "b\n"]
+    assert split_lines("a\r\nb\u2028c\n") == ["a\r\n", "b\u2028c\n"]
+
+def test_split_lines_like_a_text_buffer():
+    # GtkTextBuffer ends lines at "\r\n", "\r", "\n" and U+2029 only
+    assert split_lines("a\rb\u2029c\r\n\r\n") == ["a\r", "b\u2029", "c\r\n",
+                                                  "\r\n"]
+    assert split_lines("a\u2028b\x0cc\x85d") == ["a\u2028b\x0cc\x85d"]
+
+@pytest.mark.parametrize("old, new", [
+    ("a\nb\nc\n", "a\nb\nc\n"),
+    ("a\nb\nc\n", "a\nB\nc\n"),
+    ("a\nb\nc\n", "a\nc\n"),
+    ("a\nb\nc\n", "x\na\nb\nc\ny\n"),
+    ("a\nb\na\nb\n", "b\na\nb\na\n"),
+    ("", "a\nb\n"),
+    ("a\nb\n", ""),
+])
+def test_line_changes(old, new):
+    old_lines = split_lines(old)
+    new_lines = split_lines(new)
+    changes = line_changes(old_lines, new_lines)
+    assert apply_changes(old_lines, changes) == new_lines
+
+def test_line_changes_of_one_line():
+    old_lines = split_lines("a\nb\nc\n")
+    assert line_changes(old_lines, split_lines("a\nB\nc\n")) == [(1, 2, ["B\n"])]
+    assert line_changes(old_lines, old_lines) == []
+
+def test_line_changes_are_in_reverse_order():
+    changes = line_changes(split_lines("a\nb\nc\nd\ne\n"),
+                           split_lines("A\nb\nc\nd\nE\n"))
+    assert [change[0] for change in changes] == [4, 0]